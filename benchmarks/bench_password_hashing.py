@@ -0,0 +1,60 @@
+"""Logins/sec per worker for the password hashers.
+
+Drives verify_password() with concurrent coroutines on one event loop, the way a
+single uvicorn worker sees a login storm, and reports throughput per hasher.
+
+    python -m benchmarks.bench_password_hashing --logins 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import time
+
+from utils.helper_password import HASHERS, PASSWORD_HASH_WORKERS, verify_password
+
+
+async def measure(hashed: str, logins: int, concurrency: int) -> tuple[float, float]:
+    # Logins per second and the worst event-loop lag in milliseconds
+    queue = asyncio.Queue()
+    for _ in range(logins):
+        queue.put_nowait(None)
+
+    async def client():
+        while not queue.empty():
+            queue.get_nowait()
+            valid, _ = await verify_password("correct horse battery staple", hashed)
+            assert valid
+
+    # Event-loop lag while hashing shows whether other requests would still be served
+    lags = []
+
+    async def heartbeat():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - started - 0.01)
+
+    monitor = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    monitor.cancel()
+
+    max_lag = max(lags) * 1000 if lags else 0.0
+    return logins / elapsed, max_lag
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"hash threads per worker: {PASSWORD_HASH_WORKERS}, concurrency: {args.concurrency}")
+    for hasher in HASHERS:
+        hashed = hasher.hash("correct horse battery staple")
+        rate, max_lag = await measure(hashed, args.logins, args.concurrency)
+        print(f"{hasher.scheme:>8}: {rate:10.1f} logins/sec   max event-loop lag {max_lag:6.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""Cost of rendering a stock listing: ORM objects + jsonable_encoder vs row dicts + orjson.
+
+"before" is what a handler returning Stock entities paid: one model instance per row,
+then FastAPI's jsonable_encoder and json.dumps. "after" is the row_dicts + ORJSONResponse
+path the hot list endpoints use now. No database is needed; rows are synthetic.
+
+    python -m benchmarks.bench_serialization --rows 5000 --repeat 20
+
+For the end-to-end effect, compare benchmarks.load_test --scenarios stock_filter across releases.
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from utils.helper_json import ORJSONResponse
+from utils.models import Stock
+
+
+def make_rows(count: int) -> list:
+    now = datetime.now()
+    return [
+        {
+            "id": i, "stock_date": date.today(), "product_id": i, "shop_id": 1,
+            "purchase_price": 10.0 + i % 90, "selling_price": 13.0 + i % 90,
+            "opening": float(50 + i % 50), "additions": float(i % 7),
+            "created_at": now, "created_by": 0, "updated_at": now, "updated_by": None
+        }
+        for i in range(count)
+    ]
+
+
+def before(rows: list) -> bytes:
+    # SQLAlchemy builds entities without validation, as it does when loading rows
+    entities = [Stock.model_construct(**row) for row in rows]
+    return json.dumps(
+        jsonable_encoder(entities), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def after(rows: list) -> bytes:
+    return ORJSONResponse(rows).body
+
+
+def measure(fn, rows: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    assert json.loads(before(rows)) == json.loads(after(rows)), "both paths must produce the same JSON"
+
+    before_ms = measure(before, rows, args.repeat)
+    after_ms = measure(after, rows, args.repeat)
+    print(f"{args.rows} rows, best of {args.repeat}")
+    print(f"  before (entities + jsonable_encoder + json): {before_ms:8.2f} ms")
+    print(f"  after  (row dicts + orjson):                 {after_ms:8.2f} ms   {before_ms / after_ms:5.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
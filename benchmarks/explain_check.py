@@ -0,0 +1,161 @@
+"""Checks that every query the read endpoints run is backed by an index.
+
+Calls each route in-process as a seeded supervisor, captures the SQL it sends, and
+EXPLAINs every statement again with sequential scans disabled. A plan that still scans
+a whole table (a Seq Scan, or an index walked end to end with no Index Cond) means no
+index fits that query, whatever the table size. Exits non-zero when one is found.
+
+    python -m benchmarks.explain_check --embedded --seed --reset
+    python -m benchmarks.explain_check            # DATABASE_URL already seeded by benchmarks.seed_data
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+# Reference tables with a handful of rows; reading them whole is the right plan
+SMALL_TABLES = {"user_levels", "packages", "shop_types", "payment_modes", "schema_migrations"}
+FULL_SCAN_NODES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+
+
+def full_scans(plan: dict) -> List[str]:
+    """Nodes of a JSON plan that read a large table without an index condition."""
+    found = []
+    node_type = plan.get("Node Type")
+    table = plan.get("Relation Name")
+    if node_type in FULL_SCAN_NODES and table and table not in SMALL_TABLES:
+        if node_type == "Seq Scan" or (node_type != "Bitmap Heap Scan" and "Index Cond" not in plan):
+            detail = plan.get("Filter") or "no filter"
+            found.append(f"{node_type} on {table} ({detail})")
+    for child in plan.get("Plans", []):
+        found.extend(full_scans(child))
+    return found
+
+
+async def capture_route_queries() -> Dict[str, List[Tuple[str, tuple]]]:
+    import httpx
+    from sqlalchemy import event
+
+    from benchmarks.seed_data import BENCH_PASSWORD, bench_phone
+    from main import app
+    from utils.database import engine, read_engine
+
+    captured: List[Tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            captured.append((statement, tuple(parameters or ())))
+
+    engines = {engine.sync_engine, read_engine.sync_engine}
+    for db_engine in engines:
+        event.listen(db_engine, "before_cursor_execute", capture)
+
+    queries = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://explain") as client:
+        async def call(method: str, path: str, **kwargs) -> httpx.Response:
+            captured.clear()
+            response = await client.request(method, path, **kwargs)
+            if response.status_code >= 400:
+                print(f"warning: {method} {path} returned {response.status_code}", file=sys.stderr)
+            queries[f"{method} {path}"] = list(captured)
+            return response
+
+        response = await call("POST", "/auth/login", json={"phone": bench_phone(0, 0), "password": BENCH_PASSWORD})
+        if response.status_code != 200:
+            raise SystemExit(f"login failed: {response.status_code} {response.text[:200]}; was the database seeded?")
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        # The first calls also look up the principal and tenant scope, before those are cached
+        products = (await call("GET", "/products/", headers=headers)).json()
+        stock = (await call("GET", "/stock/", headers=headers)).json()
+        users = (await call("GET", "/users/", headers=headers)).json()
+        today = date.today().isoformat()
+        week_ago = (date.today() - timedelta(days=7)).isoformat()
+
+        paths = [
+            "/auth/me",
+            f"/products/?category_id={products[0]['category_id']}",
+            f"/products/{products[0]['id']}",
+            "/products/categories/",
+            f"/stock/?date_from={week_ago}&date_to={today}",
+            f"/stock/?product_id={products[0]['id']}",
+            f"/stock/filter/{today}",
+            f"/stock/{stock[0]['id']}",
+            "/shops/",
+            f"/users/{users[0]['id']}",
+            f"/reports/daily?date_from={week_ago}",
+            f"/reports/stock?stock_date={today}",
+            "/inventory/on-hand",
+            f"/inventory/on-hand/{products[0]['id']}",
+            f"/inventory/movements?product_id={products[0]['id']}",
+        ]
+        for path in paths:
+            await call("GET", path, headers=headers)
+
+    for db_engine in engines:
+        event.remove(db_engine, "before_cursor_execute", capture)
+    return queries
+
+
+async def explain(queries: Dict[str, List[Tuple[str, tuple]]]) -> Dict[str, List[str]]:
+    from utils.database import engine
+
+    problems = {}
+    async with engine.connect() as conn:
+        for route, statements in queries.items():
+            for statement, parameters in statements:
+                transaction = await conn.begin()
+                try:
+                    # Rolled back after each EXPLAIN; no statement is actually run
+                    await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+                    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                    plan = result.scalar()
+                finally:
+                    await transaction.rollback()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                scans = full_scans(plan[0]["Plan"])
+                if scans:
+                    query = " ".join(statement.split())
+                    problems.setdefault(route, []).extend(f"{scan}\n      {query[:200]}" for scan in scans)
+    return problems
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--embedded", action="store_true", help="run against a local pgserver Postgres")
+    parser.add_argument("--seed", action="store_true", help="seed the database first")
+    parser.add_argument("--reset", action="store_true", help="with --seed, drop all tables first")
+    args = parser.parse_args()
+
+    # utils.database reads its settings at import, so the environment is settled first
+    if args.embedded:
+        from benchmarks.local_postgres import start_local_postgres
+        os.environ["DATABASE_URL"] = start_local_postgres()
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-key-not-for-production")
+
+    from benchmarks import seed_data
+    if args.seed:
+        if args.reset:
+            await seed_data.reset_schema()
+        print("seeded", await seed_data.seed(companies=1, shops=2, products=100, days=7))
+
+    queries = await capture_route_queries()
+    problems = await explain(queries)
+    await seed_data.engine.dispose()
+
+    checked = sum(len(statements) for statements in queries.values())
+    for route, statements in queries.items():
+        status = "FULL SCAN" if route in problems else "ok"
+        print(f"{status:>9}  {route}  ({len(statements)} queries)")
+        for problem in problems.get(route, []):
+            print(f"           - {problem}")
+    print(f"{checked} queries over {len(queries)} routes, {len(problems)} routes with full scans")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""Latency percentiles and throughput of the hot endpoints under concurrent load.
+
+Starts the app from main.py with uvicorn (unless --url points at a running one), logs
+in as the supervisors created by benchmarks.seed_data and drives each scenario with
+--concurrency clients, reporting p50/p95/p99 and requests/sec per scenario.
+
+    # throwaway local Postgres, fresh data, default scenarios
+    python -m benchmarks.load_test --embedded --seed --reset --concurrency 32 --requests 1000
+
+    # an already seeded database / running deployment
+    python -m benchmarks.load_test --url http://localhost:8000 --companies 2 --shops 3
+
+--output writes the results as JSON so runs can be compared across releases.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class BenchUser:
+    phone: str
+    token: str = ""
+    product_ids: List[int] = field(default_factory=list)
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    latencies: List[float]
+    errors: int
+    elapsed: float
+
+    def percentile(self, pct: float) -> float:
+        # Nearest-rank percentile, in milliseconds
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+        return ordered[rank] * 1000
+
+    def summary(self) -> dict:
+        return {
+            "scenario": self.name,
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "rps": len(self.latencies) / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": max(self.latencies) * 1000 if self.latencies else 0.0,
+        }
+
+
+def scenario_login(args):
+    from benchmarks.seed_data import BENCH_PASSWORD
+
+    async def run(client: httpx.AsyncClient, user: BenchUser):
+        return await client.post("/auth/login", json={"phone": user.phone, "password": BENCH_PASSWORD})
+    return run
+
+
+def scenario_me(args):
+    async def run(client: httpx.AsyncClient, user: BenchUser):
+        return await client.get("/auth/me", headers=user.headers)
+    return run
+
+
+def scenario_stock_filter(args):
+    async def run(client: httpx.AsyncClient, user: BenchUser):
+        stock_date = date.today() - timedelta(days=random.randrange(args.days))
+        return await client.get(f"/stock/filter/{stock_date.isoformat()}", headers=user.headers)
+    return run
+
+
+def scenario_stock_sheet(args):
+    async def run(client: httpx.AsyncClient, user: BenchUser):
+        stock_date = date.today() - timedelta(days=random.randrange(args.days))
+        return await client.get(f"/stock/sheet/{stock_date.isoformat()}", headers=user.headers)
+    return run
+
+
+def scenario_products(args):
+    async def run(client: httpx.AsyncClient, user: BenchUser):
+        return await client.get("/products/", params={"limit": 100}, headers=user.headers)
+    return run
+
+
+def scenario_stock_bulk(args):
+    async def run(client: httpx.AsyncClient, user: BenchUser):
+        items = [
+            {"product_id": product_id, "additions": random.randint(0, 5)}
+            for product_id in random.sample(user.product_ids, min(args.bulk_items, len(user.product_ids)))
+        ]
+        return await client.post(
+            "/stock/bulk", json={"stock_date": date.today().isoformat(), "items": items}, headers=user.headers
+        )
+    return run
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "login": scenario_login,
+    "me": scenario_me,
+    "stock_filter": scenario_stock_filter,
+    "stock_sheet": scenario_stock_sheet,
+    "products": scenario_products,
+    "stock_bulk": scenario_stock_bulk,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_app(workers: int) -> tuple:
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=os.environ.copy()
+    )
+    url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=url) as client:
+        for _ in range(300):
+            if process.poll() is not None:
+                raise SystemExit(f"uvicorn exited with code {process.returncode}")
+            try:
+                await client.get("/health/db")
+                return process, url
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    process.terminate()
+    raise SystemExit("uvicorn did not start within 30s")
+
+
+async def prepare_users(client: httpx.AsyncClient, args) -> List[BenchUser]:
+    from benchmarks.seed_data import BENCH_PASSWORD, bench_phone
+
+    phones = [bench_phone(c, s) for c in range(args.companies) for s in range(args.shops)][:args.users]
+    users = []
+    for phone in phones:
+        response = await client.post("/auth/login", json={"phone": phone, "password": BENCH_PASSWORD})
+        if response.status_code != 200:
+            raise SystemExit(f"login failed for {phone}: {response.status_code} {response.text[:200]}; was the database seeded?")
+        user = BenchUser(phone=phone, token=response.json()["access_token"])
+        response = await client.get("/products/", params={"limit": 1000}, headers=user.headers)
+        user.product_ids = [product["id"] for product in response.json()] if response.status_code == 200 else []
+        users.append(user)
+    return users
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, run, users: List[BenchUser], args) -> ScenarioResult:
+    remaining = args.requests
+    latencies = []
+    errors = 0
+
+    async def worker(worker_id: int):
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            user = users[(worker_id + remaining) % len(users)]
+            started = time.perf_counter()
+            try:
+                response = await run(client, user)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return ScenarioResult(name, latencies, errors, time.perf_counter() - started)
+
+
+def print_report(results: List[ScenarioResult]):
+    print(f"{'scenario':<14}{'requests':>9}{'errors':>8}{'rps':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for result in results:
+        row = result.summary()
+        print(
+            f"{row['scenario']:<14}{row['requests']:>9}{row['errors']:>8}{row['rps']:>10.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark a running app instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting the app")
+    parser.add_argument("--embedded", action="store_true", help="run against a local pgserver Postgres")
+    parser.add_argument("--seed", action="store_true", help="seed the database before the run")
+    parser.add_argument("--reset", action="store_true", help="with --seed, drop all tables first")
+    parser.add_argument("--companies", type=int, default=2)
+    parser.add_argument("--shops", type=int, default=3, help="shops per company")
+    parser.add_argument("--products", type=int, default=200, help="products per shop")
+    parser.add_argument("--days", type=int, default=30, help="days of stock ending today")
+    parser.add_argument("--users", type=int, default=50, help="distinct logged-in users to spread load over")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated, from: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--bulk-items", type=int, default=50, help="items per stock-take in stock_bulk")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # utils.database reads its settings at import, so the environment is settled first
+    if args.embedded:
+        from benchmarks.local_postgres import start_local_postgres
+        os.environ["DATABASE_URL"] = start_local_postgres()
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-key-not-for-production")
+
+    if args.seed:
+        from benchmarks import seed_data
+        if args.reset:
+            await seed_data.reset_schema()
+        print("seeded", await seed_data.seed(args.companies, args.shops, args.products, args.days))
+        await seed_data.engine.dispose()
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = await start_app(args.workers)
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            users = await prepare_users(client, args)
+            results = []
+            for name in args.scenarios.split(","):
+                run = SCENARIOS[name.strip()](args)
+                results.append(await run_scenario(client, name.strip(), run, users, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"{url}  concurrency {args.concurrency}  users {len(users)}")
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": [result.summary() for result in results]}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""Containerless Postgres for benchmarks, using the pgserver package.
+
+The server lives in a data directory of its own and keeps running until the process
+that started it exits, so nothing else on the machine has to be set up.
+"""
+import os
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), ".pgdata")
+
+
+def start_local_postgres(data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """Starts (or reuses) a local server and returns its URL for DATABASE_URL."""
+    try:
+        import pgserver
+    except ImportError as e:
+        raise SystemExit("The local Postgres stand-in needs pgserver: pip install -r benchmarks/requirements.txt") from e
+
+    server = pgserver.get_server(data_dir, cleanup_mode="stop")
+    # pgserver hands out a libpq URL; the app connects through asyncpg
+    parts = urlsplit(server.get_uri())
+    return urlunsplit(("postgresql+asyncpg",) + tuple(parts[1:]))
\ No newline at end of file
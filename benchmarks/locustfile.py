@@ -0,0 +1,59 @@
+"""Locust mix of the hot endpoints, for soak tests and ramp-ups against a running app.
+
+Seed first with benchmarks.seed_data, then, with the same tree size in the environment:
+
+    BENCH_COMPANIES=2 BENCH_SHOPS=3 locust -f benchmarks/locustfile.py --host http://localhost:8000
+"""
+import os
+import random
+from datetime import date, timedelta
+
+from locust import HttpUser, between, task
+
+from benchmarks.seed_data import BENCH_PASSWORD, bench_phone
+
+BENCH_COMPANIES = int(os.getenv("BENCH_COMPANIES", "2"))
+BENCH_SHOPS = int(os.getenv("BENCH_SHOPS", "3"))
+BENCH_DAYS = int(os.getenv("BENCH_DAYS", "30"))
+BENCH_BULK_ITEMS = int(os.getenv("BENCH_BULK_ITEMS", "50"))
+
+
+class ShopSupervisor(HttpUser):
+    wait_time = between(0.1, 1)
+
+    def on_start(self):
+        self.phone = bench_phone(random.randrange(BENCH_COMPANIES), random.randrange(BENCH_SHOPS))
+        self.login()
+        response = self.client.get("/products/", params={"limit": 1000}, headers=self.headers, name="/products/ (setup)")
+        self.product_ids = [product["id"] for product in response.json()] if response.ok else []
+
+    def login(self):
+        response = self.client.post("/auth/login", json={"phone": self.phone, "password": BENCH_PASSWORD})
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"} if response.ok else {}
+
+    @task(1)
+    def relogin(self):
+        self.login()
+
+    @task(5)
+    def me(self):
+        self.client.get("/auth/me", headers=self.headers)
+
+    @task(10)
+    def stock_sheet(self):
+        stock_date = date.today() - timedelta(days=random.randrange(BENCH_DAYS))
+        self.client.get(f"/stock/filter/{stock_date.isoformat()}", headers=self.headers, name="/stock/filter/{date}")
+
+    @task(10)
+    def products(self):
+        self.client.get("/products/", params={"limit": 100}, headers=self.headers)
+
+    @task(2)
+    def stock_take(self):
+        if not self.product_ids:
+            return
+        items = [
+            {"product_id": product_id, "additions": random.randint(0, 5)}
+            for product_id in random.sample(self.product_ids, min(BENCH_BULK_ITEMS, len(self.product_ids)))
+        ]
+        self.client.post("/stock/bulk", json={"stock_date": date.today().isoformat(), "items": items}, headers=self.headers)
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""Seeds a scratch database with a synthetic tenant tree for load tests.
+
+Creates N companies x M shops x K products per shop and D days of stock ending
+today. Every shop gets one supervisor who can log in as bench_phone(company, shop)
+with BENCH_PASSWORD, which is what the load drivers use.
+
+    python -m benchmarks.seed_data --companies 2 --shops 5 --products 300 --days 30 --reset
+
+--reset drops every table first: only point this at a throwaway database.
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import SQLModel
+
+from utils.database import engine, init_db
+from utils.helper_password import hash_password
+from utils.models import (
+    Companies, Licenses, Packages, Product_Categories, Products, Shop_Types, Shops, User_Levels, Users
+)
+
+BENCH_PASSWORD = "bench-password"
+CATEGORIES_PER_SHOP = 10
+INSERT_CHUNK_SIZE = 5000
+
+
+def bench_phone(company: int, shop: int) -> str:
+    # company and shop are 0-based positions in the generated tree
+    return f"07{company:04d}{shop:04d}"
+
+
+def audit(now: datetime) -> dict:
+    return {"created_at": now, "created_by": 0, "updated_at": now}
+
+
+async def insert_returning_ids(conn, model, rows: list) -> list:
+    ids = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        result = await conn.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            rows[start:start + INSERT_CHUNK_SIZE]
+        )
+        ids.extend(result.scalars().all())
+    return ids
+
+
+async def reset_schema():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+
+
+async def seed(companies: int, shops: int, products: int, days: int) -> dict:
+    await init_db()
+    now = datetime.now()
+    password = await hash_password(BENCH_PASSWORD)
+    first_day = date.today() - timedelta(days=days - 1)
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            pg_insert(User_Levels).on_conflict_do_nothing(index_elements=[User_Levels.id]),
+            [
+                {"id": level, "name": name, "level": level, **audit(now)}
+                for level, name in enumerate(["super-admin", "admin", "supervisor", "cashier"])
+            ]
+        )
+        [shop_type_id] = await insert_returning_ids(conn, Shop_Types, [{"name": "bench", **audit(now)}])
+        [package_id] = await insert_returning_ids(conn, Packages, [
+            # Packages keep created_at as text
+            {"name": "bench", "amount": 0, "pay": 0, "validity": 365, "color": "grey",
+             **audit(now), "created_at": now.isoformat()}
+        ])
+        license_ids = await insert_returning_ids(conn, Licenses, [
+            {"key": f"bench-{c}-{now.timestamp()}", "package_id": package_id, "payment_id": 0,
+             "expires_at": now + timedelta(days=365), **audit(now)}
+            for c in range(companies)
+        ])
+        company_ids = await insert_returning_ids(conn, Companies, [
+            {"name": f"Bench Company {c} {now.timestamp()}", "license_id": license_ids[c], **audit(now)}
+            for c in range(companies)
+        ])
+        shop_ids = await insert_returning_ids(conn, Shops, [
+            {"name": f"Bench Shop {c}-{s}", "location": "bench", "company_id": company_ids[c],
+             "shop_type_id": shop_type_id, **audit(now)}
+            for c in range(companies) for s in range(shops)
+        ])
+
+        await conn.execute(insert(Users), [
+            {"name": f"Bench Supervisor {c}-{s}", "phone": bench_phone(c, s), "password": password,
+             "shop_id": shop_ids[c * shops + s], "user_level_id": 2, **audit(now)}
+            for c in range(companies) for s in range(shops)
+        ])
+
+        category_ids = await insert_returning_ids(conn, Product_Categories, [
+            {"name": f"Category {k}", "shop_id": shop_id, **audit(now)}
+            for shop_id in shop_ids for k in range(CATEGORIES_PER_SHOP)
+        ])
+        product_rows = []
+        for i, shop_id in enumerate(shop_ids):
+            for k in range(products):
+                purchase_price = 10 + k % 90
+                product_rows.append({
+                    "name": f"Product {k}", "shop_id": shop_id,
+                    "category_id": category_ids[i * CATEGORIES_PER_SHOP + k % CATEGORIES_PER_SHOP],
+                    "purchase_price": purchase_price, "selling_price": purchase_price * 1.3, **audit(now)
+                })
+        await insert_returning_ids(conn, Products, product_rows)
+
+        # One stock row per product per day, generated in the database
+        result = await conn.execute(
+            text("""
+                INSERT INTO stock (stock_date, product_id, shop_id, purchase_price, selling_price,
+                                   opening, additions, created_at, created_by, updated_at)
+                SELECT day::date, p.id, p.shop_id, p.purchase_price, p.selling_price,
+                       50 + p.id % 50, p.id % 7, :now, 0, :now
+                FROM products p
+                CROSS JOIN generate_series(CAST(:first_day AS date), CAST(:last_day AS date), interval '1 day') AS day
+                WHERE p.shop_id = ANY(:shop_ids)
+                ON CONFLICT DO NOTHING
+            """),
+            {"now": now, "first_day": first_day, "last_day": date.today(), "shop_ids": shop_ids}
+        )
+
+    return {
+        "companies": len(company_ids),
+        "shops": len(shop_ids),
+        "products": len(product_rows),
+        "stock_rows": result.rowcount,
+        "first_day": first_day.isoformat(),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--companies", type=int, default=2)
+    parser.add_argument("--shops", type=int, default=3, help="shops per company")
+    parser.add_argument("--products", type=int, default=200, help="products per shop")
+    parser.add_argument("--days", type=int, default=30, help="days of stock ending today")
+    parser.add_argument("--reset", action="store_true", help="drop all tables first")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.reset:
+        await reset_schema()
+    summary = await seed(args.companies, args.shops, args.products, args.days)
+    print(f"seeded {summary} in {time.perf_counter() - started:.1f}s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
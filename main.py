@@ -1,16 +1,22 @@
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 
-from utils.database import init_db
-from routes import auth, companies, licenses, packages, products, product_categories, shop_types, shops, stock, user_levels, users
+from utils.database import engine, init_db, pool_stats, read_engine
+from utils.helper_metrics import MetricsMiddleware, render_metrics
+from utils.helper_query_budget import QUERY_BUDGET_MODE, QueryBudgetMiddleware
+from utils.helper_replica import mark_recent_write
+from utils.helper_scheduler import start_background_jobs, stop_background_jobs
+from routes import auth, companies, inventory, licenses, packages, products, product_categories, reports, sales, shop_types, shops, stock, user_levels, users
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    background_jobs = start_background_jobs()
     yield
+    await stop_background_jobs(background_jobs)
 
 app = FastAPI(
     title="Easy-Stock Backend", 
@@ -23,15 +29,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization"],  # Common needed headers
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor of list endpoints
 )
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    # After a successful write, the same user's reads skip the replica until it catches up
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            await mark_recent_write(token)
+    return response
+
+if QUERY_BUDGET_MODE != "off":
+    app.add_middleware(QueryBudgetMiddleware)
+
+# Added last so it wraps everything else and times the whole request
+app.add_middleware(MetricsMiddleware)
+
 # Include all routers
 app.include_router(auth.router)
 app.include_router(companies.router)
+app.include_router(inventory.router)
 app.include_router(licenses.router)
 app.include_router(packages.router)
 app.include_router(products.router)
 app.include_router(product_categories.router)
+app.include_router(reports.router)
+app.include_router(sales.router)
 app.include_router(shop_types.router)
 app.include_router(shops.router)
 app.include_router(stock.router)
@@ -40,4 +66,15 @@ app.include_router(users.router)
 
 @app.get("/", include_in_schema=False)
 async def root():
-    return RedirectResponse("/docs")
\ No newline at end of file
+    return RedirectResponse("/docs")
+
+@app.get("/health/db", include_in_schema=False)
+async def health_db():
+    stats = pool_stats()
+    if read_engine is not engine:
+        stats["replica"] = pool_stats(read_engine)
+    return stats
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
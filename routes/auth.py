@@ -5,10 +5,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from utils.database import get_session
 from utils.helper_auth import authenticate_user, create_access_token, get_current_user
 from utils.models import Users
+from utils.helper_query_budget import route_budget
+from utils.schemas import UserRow
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/login")
+@route_budget(3)
 async def login(
     phone: str = Body(..., embed=True),
     password: str = Body(..., embed=True),
@@ -31,6 +34,7 @@ async def login(
         }
     }
 
-@router.get("/me")
+@router.get("/me", response_model=UserRow)
+@route_budget(1)
 async def me(current_user: Users = Depends(get_current_user)):
     return current_user
\ No newline at end of file
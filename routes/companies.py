@@ -1,59 +1,59 @@
 
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import Optional, Set
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
-from utils.models import Companies, Shops, Users
+from utils.models import Companies, Users
 from utils.database import get_session
+from utils.helper_replica import get_read_session
 from routes.auth import get_current_user
+from utils.helper_tenant import TenantScope, get_tenant_scope, invalidate_all_tenant_scopes, require_company
+from utils.helper_query_budget import route_budget
+from utils.helper_updates import partial_update
+from utils.helper_versioning import get_if_match, version_etag
 
 router = APIRouter(prefix="/companies", tags=["Companies"])
 
 @router.get("/")
+@route_budget(3)
 async def get_companies(
-    session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
     # Super-admin (level 0) sees ALL Companies
-    if current_user.user_level_id == 0:
+    if scope.user_level_id == 0:
         statement = select(Companies)
     else:
-        # Normal user: only see license of their company
-        # Join: User → Shop → Company → License
-        statement = (
-            select(Companies)
-            .join(Shops, Shops.company_id == Companies.id)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
-        )
+        # Normal user: only see the company their shop belongs to
+        statement = select(Companies).where(Companies.id == scope.company_id)
 
     result = await session.execute(statement)
     companies = result.scalars().all()
 
-    if not companies and current_user.user_level.level != 0:
+    if not companies and scope.user_level_id != 0:
         raise HTTPException(status_code=404, detail="No company found")
 
     return companies
 
 @router.get("/{company_id}")
+@route_budget(3)
 async def get_company(
     company_id: int,
-    session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
     # Super-admin (level 0) sees ALL Companies
-    if current_user.user_level_id == 0:
+    if scope.user_level_id == 0:
         statement = select(Companies).where(Companies.id == company_id)
     else:
-        # Normal user: only see license of their company
-        # Join: User → Shop → Company → License
+        # Normal user: only see the company their shop belongs to
         statement = (
             select(Companies)
-            .join(Shops, Shops.company_id == Companies.id)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
+            .where(Companies.id == company_id)
+            .where(Companies.id == scope.company_id)
         )
 
     result = await session.execute(statement)
@@ -62,9 +62,11 @@ async def get_company(
     if not company:
         raise HTTPException(status_code=404, detail="No company found")
 
+    response.headers["ETag"] = version_etag(company.version)
     return company
 
 @router.post("/", response_model=Companies, status_code=201)
+@route_budget(3)
 async def create_company(
     company: Companies, 
     session: AsyncSession = Depends(get_session),
@@ -87,11 +89,15 @@ async def create_company(
     return company
 
 @router.patch("/{company_id}", response_model=Companies)
+@route_budget(4)
 async def update_company(
     company_id: int,
     company_update: Companies,
+    response: Response,
+    expected_versions: Optional[Set[int]] = Depends(get_if_match),
     session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    current_user: Users = Depends(get_current_user),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
 
     # Only super-admin & admin (user_level_id in 0, 1) can update Companies
@@ -101,44 +107,19 @@ async def update_company(
             detail="Only super-admin & admin can update Companies"
         )
 
-    # Fetch the existing company
-    statement = select(Companies).where(Companies.id == company_id)
-    result = await session.execute(statement)
-    db_company = result.scalar.one_or_none()
-
-    if not db_company:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Company not found"
-        )
-        
+    criteria = [Companies.id == company_id]
     #if admin level is 1, restrict to only update own company
     if current_user.user_level_id == 1:
-        # Verify that the company belongs to the user's shop
-        shop_statement = select(Shops).where(Shops.company_id == company_id).where(Shops.id == current_user.shop_id)
-        shop_result = await session.execute(shop_statement)
-        shop = shop_result.scalar_one_or_none()
-        if not shop:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Admin can only update their own company"
-            )
-
-    # Get the update data as dict (only fields that were sent)
-    update_data = company_update.model_dump(exclude_unset=True)
-
-    # Update fields (excluding protected ones like id, created_at, etc.)
-    for key, value in update_data.items():
-        if key not in {"id", "created_at", "created_by", "updated_at", "updated_by"}:  # Protect audit fields
-            setattr(db_company, key, value)
-
-    # Update audit fields
-    db_company.updated_by = current_user.id
-    db_company.updated_at = datetime.now()
-    
-    # Commit changes
-    session.add(db_company)
+        require_company(scope)
+        criteria.append(Companies.id == scope.company_id)
+
+    db_company = await partial_update(
+        session, Companies, company_update, criteria, current_user.id, "Company", expected_versions
+    )
     await session.commit()
-    await session.refresh(db_company)
 
+    # The company's license is part of every cached tenant scope of its shops
+    await invalidate_all_tenant_scopes()
+
+    response.headers["ETag"] = version_etag(db_company["version"])
     return db_company
\ No newline at end of file
@@ -0,0 +1,188 @@
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.models import Products, Shops, Stock_Balances, Stock_Movements, Users
+from utils.database import get_session
+from utils.helper_replica import get_read_session
+from routes.auth import get_current_user
+from utils.helper_json import ORJSONResponse, row_dicts
+from utils.helper_ledger import MovementType
+from utils.helper_pagination import Page, get_page, keyset_paginate, next_page
+from utils.helper_query_budget import route_budget
+from utils.helper_stock_sheet import invalidate_stock_sheet
+from utils.helper_summary import mark_summary_dirty
+from utils.helper_transfers import transfer_stock
+from utils.schemas import StockBalanceRow, StockMovementRow, StockTransfer, StockTransferResult
+
+router = APIRouter(prefix="/inventory", tags=["Inventory"])
+
+# Columns of an on-hand row
+BALANCE_ROW_COLUMNS = (
+    Stock_Balances.product_id,
+    Products.name.label("product_name"),
+    Products.category_id,
+    Stock_Balances.on_hand,
+    Stock_Balances.out_of_stock_since,
+    Stock_Balances.updated_at
+)
+
+@router.get("/on-hand", response_model=List[StockBalanceRow], response_class=ORJSONResponse)
+@route_budget(2)
+async def get_on_hand(
+    response: Response,
+    category_id: Optional[int] = None,
+    out_of_stock: Optional[bool] = None,
+    page: Page = Depends(get_page),
+    session: AsyncSession = Depends(get_read_session),
+    current_user: Users = Depends(get_current_user)
+):
+    # Running balances kept by the ledger: no aggregate over the stock history
+    statement = (
+        select(*BALANCE_ROW_COLUMNS)
+        .join(Products, Stock_Balances.product_id == Products.id)
+        .where(Stock_Balances.shop_id == current_user.shop_id)
+    )
+
+    if category_id is not None:
+        statement = statement.where(Products.category_id == category_id)
+    if out_of_stock is not None:
+        statement = statement.where(Stock_Balances.on_hand <= 0 if out_of_stock else Stock_Balances.on_hand > 0)
+
+    statement = keyset_paginate(statement, [Stock_Balances.product_id], page)
+    result = await session.execute(statement)
+    balances = next_page(response, row_dicts(result), page, lambda balance: [balance["product_id"]])
+
+    if not balances and not page.cursor:
+        raise HTTPException(status_code=404, detail="No stock on hand found")
+
+    return ORJSONResponse(balances, headers=response.headers)
+
+
+@router.get("/on-hand/{product_id}", response_model=StockBalanceRow)
+@route_budget(2)
+async def get_product_on_hand(
+    product_id: int,
+    session: AsyncSession = Depends(get_read_session),
+    current_user: Users = Depends(get_current_user)
+):
+    statement = (
+        select(*BALANCE_ROW_COLUMNS)
+        .join(Products, Stock_Balances.product_id == Products.id)
+        .where(Stock_Balances.shop_id == current_user.shop_id)
+        .where(Stock_Balances.product_id == product_id)
+    )
+
+    result = await session.execute(statement)
+    balance = result.mappings().one_or_none()
+
+    if not balance:
+        raise HTTPException(status_code=404, detail="No stock recorded for this product")
+
+    return balance
+
+
+@router.get("/movements", response_model=List[StockMovementRow], response_class=ORJSONResponse)
+@route_budget(2)
+async def get_movements(
+    response: Response,
+    product_id: Optional[int] = None,
+    movement_type: Optional[MovementType] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    page: Page = Depends(get_page),
+    session: AsyncSession = Depends(get_read_session),
+    current_user: Users = Depends(get_current_user)
+):
+    statement = (
+        select(
+            Stock_Movements.id,
+            Stock_Movements.product_id,
+            Stock_Movements.movement_type,
+            Stock_Movements.quantity,
+            Stock_Movements.balance_after,
+            Stock_Movements.stock_date,
+            Stock_Movements.reference_id,
+            Stock_Movements.created_at,
+            Stock_Movements.created_by
+        )
+        .where(Stock_Movements.shop_id == current_user.shop_id)
+    )
+
+    if product_id is not None:
+        statement = statement.where(Stock_Movements.product_id == product_id)
+    if movement_type is not None:
+        statement = statement.where(Stock_Movements.movement_type == movement_type)
+    if date_from is not None:
+        statement = statement.where(Stock_Movements.stock_date >= date_from)
+    if date_to is not None:
+        statement = statement.where(Stock_Movements.stock_date <= date_to)
+
+    statement = keyset_paginate(statement, [Stock_Movements.id], page)
+    result = await session.execute(statement)
+    movements = next_page(response, row_dicts(result), page, lambda movement: [movement["id"]])
+
+    if not movements and not page.cursor:
+        raise HTTPException(status_code=404, detail="No stock movements found")
+
+    return ORJSONResponse(movements, headers=response.headers)
+
+
+@router.post("/transfers", response_model=StockTransferResult, status_code=201)
+@route_budget(12)
+async def create_transfer(
+    transfer: StockTransfer,
+    session: AsyncSession = Depends(get_session),
+    current_user: Users = Depends(get_current_user)
+):
+
+    # Only super-admin, admins & supervisors (user_level_id in 0, 1, 2) can transfer Stock
+    if current_user.user_level_id not in [0, 1, 2]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super-admin, admin & supervisor can transfer Stock"
+        )
+
+    from_shop_id = transfer.from_shop_id or current_user.shop_id
+    # Supervisors can only send stock out of their own shop
+    if from_shop_id != current_user.shop_id and current_user.user_level_id not in [0, 1]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super-admin & admin can transfer Stock out of another Shop"
+        )
+    if from_shop_id == transfer.to_shop_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot transfer Stock to the same Shop")
+
+    # Both shops and the caller's own, to compare companies, in one query
+    statement = (
+        select(Shops.id, Shops.company_id)
+        .where(Shops.id.in_({from_shop_id, transfer.to_shop_id, current_user.shop_id}))
+    )
+    result = await session.execute(statement)
+    companies = {row.id: row.company_id for row in result.all()}
+
+    if from_shop_id not in companies or transfer.to_shop_id not in companies:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shop not found")
+    # A shop without a company shares it with nobody, not with every other such shop
+    if companies[from_shop_id] is None or companies[from_shop_id] != companies[transfer.to_shop_id]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Stock can only be transferred between Shops of the same Company"
+        )
+    # Only super-admin can transfer within another company
+    if current_user.user_level_id != 0 and companies[from_shop_id] != companies.get(current_user.shop_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shop not found")
+
+    stock_date = transfer.stock_date or date.today()
+    transferred = await transfer_stock(
+        session, from_shop_id, transfer.to_shop_id, stock_date, transfer.items, current_user.id
+    )
+    await session.commit()
+
+    for shop_id in (from_shop_id, transfer.to_shop_id):
+        mark_summary_dirty(shop_id, stock_date)
+        await invalidate_stock_sheet(shop_id, stock_date)
+    return transferred
\ No newline at end of file
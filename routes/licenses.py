@@ -1,63 +1,59 @@
 
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
-from typing import List
+from typing import List, Optional, Set
 
-from utils.models import Companies, Licenses, Shops, Users
+from utils.models import Licenses, Users
 from utils.database import get_session
+from utils.helper_replica import get_read_session
 from routes.auth import get_current_user
+from utils.helper_tenant import TenantScope, get_tenant_scope
+from utils.helper_query_budget import route_budget
+from utils.helper_updates import partial_update
+from utils.helper_versioning import get_if_match, version_etag
 
 router = APIRouter(prefix="/licenses", tags=["Licenses"])
 
 @router.get("/", response_model=List[Licenses])
+@route_budget(3)
 async def get_licenses(
-    session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
     # Super-admin (level 0) sees ALL licenses
-    if current_user.user_level_id == 0:
+    if scope.user_level_id == 0:
         statement = select(Licenses)
     else:
         # Normal user: only see license of their company
-        # Join: User → Shop → Company → License
-        statement = (
-            select(Licenses)
-            .join(Companies, Companies.license_id == Licenses.id)
-            .join(Shops, Shops.company_id == Companies.id)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
-        )
+        statement = select(Licenses).where(Licenses.id == scope.license_id)
 
     result = await session.execute(statement)
     licenses = result.scalars().all()
 
-    if not licenses and current_user.user_level.level != 0:
+    if not licenses and scope.user_level_id != 0:
         raise HTTPException(status_code=404, detail="No license found for your company")
 
     return licenses
 
 @router.get("/{license_id}", response_model=Licenses)
+@route_budget(3)
 async def get_license(
     license_id: int,
-    session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
     # Super-admin (level 0) sees ALL licenses
-    if current_user.user_level_id == 0:
+    if scope.user_level_id == 0:
         statement = select(Licenses).where(Licenses.id == license_id)
     else:
         # Normal user: only see license of their company
-        # Join: User → Shop → Company → License
         statement = (
             select(Licenses)
-            .join(Companies, Companies.license_id == Licenses.id)
-            .join(Shops, Shops.company_id == Companies.id)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
             .where(Licenses.id == license_id)
+            .where(Licenses.id == scope.license_id)
         )
 
     result = await session.execute(statement)
@@ -66,9 +62,11 @@ async def get_license(
     if not license:
         raise HTTPException(status_code=404, detail="License not found")
 
+    response.headers["ETag"] = version_etag(license.version)
     return license
 
 @router.post("/", response_model=Licenses, status_code=201)
+@route_budget(3)
 async def create_license(
     license: Licenses, 
     session: AsyncSession = Depends(get_session),
@@ -84,9 +82,12 @@ async def create_license(
 
 
 @router.patch("/{license_id}", response_model=Licenses)
+@route_budget(3)
 async def update_license(
     license_id: int,
     license_update: Licenses,
+    response: Response,
+    expected_versions: Optional[Set[int]] = Depends(get_if_match),
     session: AsyncSession = Depends(get_session),
     current_user: Users = Depends(get_current_user)
 ):
@@ -97,32 +98,10 @@ async def update_license(
             detail="Only super-admin can update Licenses"
         )
 
-    # Fetch the existing license
-    statement = select(Licenses).where(Licenses.id == license_id)
-    result = await session.execute(statement)
-    db_license = result.scalar_one_or_none()
-
-    if not db_license:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="License not found"
-        )
-
-    # Get the update data as dict (only fields that were sent)
-    update_data = license_update.model_dump(exclude_unset=True)
-
-    # Update fields (excluding protected ones like id, created_at, etc.)
-    for key, value in update_data.items():
-        if key not in {"id", "created_at", "created_by", "updated_at", "updated_by"}:  # Protect audit fields
-            setattr(db_license, key, value)
-
-    # Update audit fields
-    db_license.updated_by = current_user.id
-    db_license.updated_at = datetime.now()
-    
-    # Commit changes
-    session.add(db_license)
+    db_license = await partial_update(
+        session, Licenses, license_update, [Licenses.id == license_id], current_user.id, "License", expected_versions
+    )
     await session.commit()
-    await session.refresh(db_license)
 
+    response.headers["ETag"] = version_etag(db_license["version"])
     return db_license
\ No newline at end of file
@@ -1,51 +1,74 @@
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from utils.models import Packages, Users
 from utils.database import get_session
+from utils.helper_etag import catalog_version
+from utils.helper_response_cache import CachedResponse, body_version, cached_json_response, invalidate_responses, render_json
+from utils.helper_query_budget import route_budget
 from routes.auth import get_current_user 
 
 router = APIRouter(prefix="/packages", tags=["Packages"])
 
 @router.get("/", response_model=List[Packages])
-async def get_packages(session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(Packages))
-    return result.scalars().all()
+@route_budget(2)
+async def get_packages(
+    request: Request,
+    session: AsyncSession = Depends(get_session)
+):
+    async def build() -> CachedResponse:
+        version = await catalog_version(session, Packages)
+        result = await session.execute(select(Packages))
+        return CachedResponse(version.etag, version.last_modified, render_json(result.scalars().all()))
+
+    # Rendered once and shared by every worker through Redis until a write invalidates it; built
+    # from the primary, as a lagging replica could otherwise refill the cache with the old list
+    return await cached_json_response(request, "packages:list", build)
 
 @router.get("/{package_id}", response_model=Packages)
+@route_budget(1)
 async def get_package(
     package_id: int,
+    request: Request,
     session: AsyncSession = Depends(get_session)
 ):
-    statement = select(Packages).where(Packages.id == package_id)    
-    result = await session.execute(statement)
-    package = result.scalar_one_or_none()
+    async def build() -> CachedResponse:
+        statement = select(Packages).where(Packages.id == package_id)    
+        result = await session.execute(statement)
+        package = result.scalar_one_or_none()
 
-    if not package:
-        raise HTTPException(status_code=404, detail="Package not found")
+        if not package:
+            raise HTTPException(status_code=404, detail="Package not found")
 
-    return package
+        body = render_json(package)
+        version = body_version(body, package.updated_at)
+        return CachedResponse(version.etag, version.last_modified, body)
+
+    return await cached_json_response(request, f"packages:{package_id}", build)
 
 @router.post("/", response_model=Packages, status_code=201)
+@route_budget(3)
 async def create_package(
     package: Packages,
     session: AsyncSession = Depends(get_session),
     current_user: Users = Depends(get_current_user)
 ):
-    if current_user.user_level.level != 0:
+    if current_user.user_level_id != 0:
         raise HTTPException(status_code=403, detail="Only super-admin can create packages")
     
     package.created_by = current_user.id
     session.add(package)
     await session.commit()
     await session.refresh(package)
+    await invalidate_responses("packages:list")
     return package
 
 @router.patch("/{package_id}", response_model=Packages)
+@route_budget(4)
 async def update_package(
     package_id: int,
     package_update: Packages,
@@ -86,5 +109,6 @@ async def update_package(
     session.add(db_package)
     await session.commit()
     await session.refresh(db_package)
+    await invalidate_responses("packages:list", f"packages:{package_id}")
 
     return db_package
\ No newline at end of file
@@ -1,20 +1,36 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
 from utils.models import Product_Categories, Users
 from utils.database import get_session
+from utils.helper_etag import catalog_version, conditional_response
+from utils.helper_replica import get_read_session
+from utils.helper_stock_sheet import invalidate_shop_stock_sheets
+from utils.helper_query_budget import route_budget
 from routes.auth import get_current_user
 
 router = APIRouter(prefix="/products/categories", tags=["Product Categories"])
 
 @router.get("/")
+@route_budget(3)
 async def get_product_categories(
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     current_user: Users = Depends(get_current_user)
 ):
+    # Answer revalidations from the shop's categories version before loading anything
+    version = await catalog_version(
+        session, Product_Categories, Product_Categories.shop_id == current_user.shop_id,
+        scope=str(current_user.shop_id)
+    )
+    not_modified = conditional_response(request, response, version)
+    if not_modified:
+        return not_modified
+
     statement = select(Product_Categories).where(Product_Categories.shop_id == current_user.shop_id)
 
     result = await session.execute(statement)
@@ -27,9 +43,10 @@ async def get_product_categories(
 
 
 @router.get("/{product_category_id}")
+@route_budget(2)
 async def get_product_category(
     product_category_id: int,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     current_user: Users = Depends(get_current_user)
 ):
     statement = (
@@ -47,6 +64,7 @@ async def get_product_category(
     return product_category
 
 @router.post("/", response_model=Product_Categories, status_code=201)
+@route_budget(3)
 async def create_product_category(
     product_category: Product_Categories, 
     session: AsyncSession = Depends(get_session),
@@ -70,6 +88,7 @@ async def create_product_category(
 
 
 @router.patch("/{product_category_id}", response_model=Product_Categories)
+@route_budget(4)
 async def update_product_category(
     product_category_id: int,
     product_category_update: Product_Categories,
@@ -116,4 +135,6 @@ async def update_product_category(
     await session.commit()
     await session.refresh(db_product_category)
 
+    # Category names are part of the shop's stock sheets
+    await invalidate_shop_stock_sheets(db_product_category.shop_id)
     return db_product_category
\ No newline at end of file
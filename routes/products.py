@@ -1,35 +1,67 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
 from utils.models import Products, Users
 from utils.database import get_session
+from utils.helper_replica import get_read_session
 from routes.auth import get_current_user
+from utils.helper_json import ORJSONResponse, row_dicts
+from utils.helper_pagination import Page, get_page, keyset_paginate, next_page
+from utils.helper_query_budget import route_budget
+from utils.helper_stock_sheet import invalidate_shop_stock_sheets
+from utils.helper_updates import partial_update
+from utils.helper_versioning import get_if_match, version_etag
+from utils.schemas import ProductRow
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
-@router.get("/")
+@router.get("/", response_model=List[ProductRow], response_class=ORJSONResponse)
+@route_budget(2)
 async def get_products(
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    category_id: Optional[int] = None,
+    name: Optional[str] = None,
+    page: Page = Depends(get_page),
+    session: AsyncSession = Depends(get_read_session),
     current_user: Users = Depends(get_current_user)
 ):
-    statement = select(Products).where(Products.shop_id == current_user.shop_id)
+    statement = (
+        select(
+            Products.id,
+            Products.name,
+            Products.category_id,
+            Products.purchase_price,
+            Products.selling_price,
+            Products.updated_at
+        )
+        .where(Products.shop_id == current_user.shop_id)
+    )
+
+    if category_id is not None:
+        statement = statement.where(Products.category_id == category_id)
+    if name:
+        statement = statement.where(Products.name.istartswith(name, autoescape=True))
 
+    statement = keyset_paginate(statement, [Products.id], page)
     result = await session.execute(statement)
-    products = result.scalars().all()
+    products = next_page(response, row_dicts(result), page, lambda product: [product["id"]])
 
-    if not products:
+    if not products and not page.cursor:
         raise HTTPException(status_code=404, detail="No products found")
 
-    return products
+    return ORJSONResponse(products, headers=response.headers)
 
 
 @router.get("/{product_id}")
+@route_budget(2)
 async def get_product(
     product_id: int,
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     current_user: Users = Depends(get_current_user)
 ):
     statement = (
@@ -44,10 +76,12 @@ async def get_product(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    response.headers["ETag"] = version_etag(product.version)
     return product
 
 
 @router.post("/", response_model=Products, status_code=201)
+@route_budget(3)
 async def create_product(
     product: Products, 
     session: AsyncSession = Depends(get_session),
@@ -71,9 +105,12 @@ async def create_product(
 
 
 @router.patch("/{product_id}", response_model=Products)
+@route_budget(3)
 async def update_product(
     product_id: int,
     product_update: Products,
+    response: Response,
+    expected_versions: Optional[Set[int]] = Depends(get_if_match),
     session: AsyncSession = Depends(get_session),
     current_user: Users = Depends(get_current_user)
 ):
@@ -85,36 +122,13 @@ async def update_product(
             detail="Only super-admin, admin & supervisor can update products"
         )
 
-    # Fetch the existing product
-    statement = (
-        select(Products)
-        .where(Products.shop_id == current_user.shop_id)
-        .where(Products.id == product_id)
+    db_product = await partial_update(
+        session, Products, product_update, [Products.shop_id == current_user.shop_id, Products.id == product_id],
+        current_user.id, "Product", expected_versions
     )
-
-    result = await session.execute(statement)
-    db_product = result.scalar_one_or_none()
-
-    if not db_product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
-        )
-
-    # Get the update data as dict (only fields that were sent)
-    update_data = product_update.model_dump(exclude_unset=True)
-
-    # Update fields (excluding protected ones like id, created_at, etc.)
-    for key, value in update_data.items():
-        if key not in {"id", "created_at", "created_by", "updated_at", "updated_by"}:  # Protect audit fields
-            setattr(db_product, key, value)
-
-    # Update audit fields
-    db_product.updated_by = current_user.id
-    db_product.updated_at = datetime.now()
-    # Commit changes
-    session.add(db_product)
     await session.commit()
-    await session.refresh(db_product)
 
+    # Product names and categories are part of the shop's stock sheets
+    await invalidate_shop_stock_sheets(db_product["shop_id"])
+    response.headers["ETag"] = version_etag(db_product["version"])
     return db_product
\ No newline at end of file
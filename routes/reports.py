@@ -0,0 +1,202 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import and_, case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.models import Bill_Items, Product_Categories, Products, Shop_Daily_Summary, Shops, Stock
+from utils.helper_replica import get_read_session
+from utils.helper_tenant import TenantScope, get_tenant_scope, in_company
+from utils.helper_query_budget import route_budget
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+# Longest range a single report may cover
+MAX_REPORT_DAYS = 366
+
+@router.get("/daily")
+@route_budget(3)
+async def get_daily_report(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    shop_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
+):
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=30)
+
+    if date_from > date_to or (date_to - date_from).days > MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"date_from must be before date_to and at most {MAX_REPORT_DAYS} days apart"
+        )
+
+    # Reads only the precomputed summaries, never the raw stock & sales rows
+    statement = (
+        select(Shop_Daily_Summary)
+        .where(Shop_Daily_Summary.summary_date >= date_from)
+        .where(Shop_Daily_Summary.summary_date <= date_to)
+        .order_by(Shop_Daily_Summary.summary_date, Shop_Daily_Summary.shop_id)
+    )
+
+    # Super-admin (level 0) sees ALL shops
+    if scope.user_level_id == 0:
+        pass
+    # Admin user (level 1) & Supervisor (level 2) sees shops their company owns
+    elif scope.user_level_id in [1, 2]:
+        statement = (
+            statement
+            .join(Shops, Shops.id == Shop_Daily_Summary.shop_id)
+            .where(in_company(Shops.company_id, scope))
+        )
+    else:
+        # Normal user: only see the shop they are attached to
+        statement = statement.where(Shop_Daily_Summary.shop_id == scope.shop_id)
+
+    if shop_id is not None:
+        statement = statement.where(Shop_Daily_Summary.shop_id == shop_id)
+
+    result = await session.execute(statement)
+    return result.scalars().all()
+
+
+@router.get("/stock")
+@route_budget(3)
+async def get_company_stock_report(
+    stock_date: Optional[date] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    company_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
+):
+    # Only super-admin, admins & supervisors (user_level_id in 0, 1, 2) see company-wide stock
+    if scope.user_level_id not in [0, 1, 2]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super-admin, admin & supervisor can view company stock reports"
+        )
+
+    # Super-admin may report on any company, everyone else on their own
+    if scope.user_level_id != 0 or company_id is None:
+        company_id = scope.company_id
+    if company_id is None:
+        raise HTTPException(status_code=404, detail="No company found")
+
+    if stock_date is not None:
+        date_from = date_to = stock_date
+    date_to = date_to or date.today()
+    date_from = date_from or date_to
+
+    if date_from > date_to or (date_to - date_from).days > MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"date_from must be before date_to and at most {MAX_REPORT_DAYS} days apart"
+        )
+
+    sold = (
+        select(
+            Bill_Items.shop_id,
+            Bill_Items.product_id,
+            Bill_Items.stock_date,
+            func.sum(Bill_Items.quantity).label("quantity")
+        )
+        .join(Shops, Shops.id == Bill_Items.shop_id)
+        .where(Shops.company_id == company_id)
+        .where(Bill_Items.stock_date.between(date_from, date_to))
+        .group_by(Bill_Items.shop_id, Bill_Items.product_id, Bill_Items.stock_date)
+        .subquery()
+    )
+
+    opening = func.coalesce(Stock.opening, 0)
+    additions = func.coalesce(Stock.additions, 0)
+    sold_quantity = func.coalesce(sold.c.quantity, 0)
+    closing = opening + additions - sold_quantity
+    day_order = {"partition_by": [Stock.shop_id, Stock.product_id]}
+
+    # Products are per shop, so the same product across shops is matched by category & name.
+    # One row per shop, product and day, numbered from both ends of the range: stock levels
+    # come from a single day (opening from the first, closing & value from the last), flows
+    # (additions, sold) add up over every day.
+    category_name = func.coalesce(Product_Categories.name, "Uncategorized").label("category_name")
+    days = (
+        select(
+            category_name,
+            Products.name.label("product_name"),
+            Stock.shop_id,
+            opening.label("opening"),
+            additions.label("additions"),
+            sold_quantity.label("sold"),
+            closing.label("closing"),
+            (closing * func.coalesce(Stock.purchase_price, 0)).label("value_cost"),
+            (closing * func.coalesce(Stock.selling_price, 0)).label("value_retail"),
+            func.row_number().over(**day_order, order_by=Stock.stock_date).label("day_from_start"),
+            func.row_number().over(**day_order, order_by=Stock.stock_date.desc()).label("day_from_end")
+        )
+        .join(Products, Products.id == Stock.product_id)
+        .join(Shops, Shops.id == Stock.shop_id)
+        .outerjoin(Product_Categories, Product_Categories.id == Products.category_id)
+        .outerjoin(sold, and_(
+            sold.c.shop_id == Stock.shop_id,
+            sold.c.product_id == Stock.product_id,
+            sold.c.stock_date == Stock.stock_date
+        ))
+        .where(Shops.company_id == company_id)
+        .where(Stock.stock_date.between(date_from, date_to))
+        .subquery()
+    )
+
+    first_day = days.c.day_from_start == 1
+    last_day = days.c.day_from_end == 1
+    closing_total = func.sum(case((last_day, days.c.closing), else_=0))
+    value_cost = func.sum(case((last_day, days.c.value_cost), else_=0))
+    value_retail = func.sum(case((last_day, days.c.value_retail), else_=0))
+
+    # Per-product sums come from GROUP BY, per-category totals from window functions over them
+    statement = (
+        select(
+            days.c.category_name,
+            days.c.product_name,
+            func.count(func.distinct(days.c.shop_id)).label("shops"),
+            func.sum(case((first_day, days.c.opening), else_=0)).label("opening"),
+            func.sum(days.c.additions).label("additions"),
+            func.sum(days.c.sold).label("sold"),
+            closing_total.label("closing"),
+            value_cost.label("value_cost"),
+            value_retail.label("value_retail"),
+            func.sum(closing_total).over(partition_by=days.c.category_name).label("category_closing"),
+            func.sum(value_cost).over(partition_by=days.c.category_name).label("category_value_cost"),
+            func.sum(value_retail).over(partition_by=days.c.category_name).label("category_value_retail")
+        )
+        .group_by(days.c.category_name, days.c.product_name)
+        .order_by(days.c.category_name, days.c.product_name)
+    )
+
+    result = await session.execute(statement)
+    rows = result.mappings().all()
+
+    categories = {}
+    products = []
+    for row in rows:
+        categories.setdefault(row["category_name"], {
+            "category_name": row["category_name"],
+            "closing": row["category_closing"],
+            "value_cost": row["category_value_cost"],
+            "value_retail": row["category_value_retail"]
+        })
+        products.append({
+            key: row[key]
+            for key in ("category_name", "product_name", "shops", "opening", "additions",
+                        "sold", "closing", "value_cost", "value_retail")
+        })
+
+    return {
+        "company_id": company_id,
+        "date_from": date_from,
+        "date_to": date_to,
+        "categories": list(categories.values()),
+        "products": products
+    }
\ No newline at end of file
@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.models import Payment_Modes, Users
+from utils.database import get_session
+from utils.helper_ledger import BALANCE_CHUNK_SIZE
+from utils.helper_replica import get_read_session
+from routes.auth import get_current_user
+from utils.helper_sales import record_sales, sale_time
+from utils.helper_summary import mark_summary_dirty
+from utils.schemas import Sale, SaleResult
+from utils.helper_query_budget import route_budget
+
+router = APIRouter(prefix="/sales", tags=["Sales"])
+
+# Largest batch of queued offline sales accepted by a single sync call
+MAX_SYNC_SALES = 500
+# Different products per checkout or sync; their balances then fit one upsert, as the route budgets assume
+MAX_SALE_PRODUCTS = BALANCE_CHUNK_SIZE
+
+def check_sale_products(sales: List[Sale]):
+    product_ids = {item.product_id for sale in sales for item in sale.items}
+    if len(product_ids) > MAX_SALE_PRODUCTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_SALE_PRODUCTS} different products can be sold at once"
+        )
+
+@router.get("/payment_modes", response_model=List[Payment_Modes])
+@route_budget(2)
+async def get_payment_modes(
+    session: AsyncSession = Depends(get_read_session),
+    current_user: Users = Depends(get_current_user)
+):
+    result = await session.execute(select(Payment_Modes))
+    return result.scalars().all()
+
+@router.post("/checkout", response_model=SaleResult, status_code=201)
+@route_budget(9)
+async def checkout(
+    sale: Sale,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_session),
+    current_user: Users = Depends(get_current_user)
+):
+    # The Idempotency-Key header takes precedence over a key in the body
+    if idempotency_key:
+        sale.idempotency_key = idempotency_key
+    check_sale_products([sale])
+
+    [result] = await record_sales(session, [sale], current_user)
+
+    if result.status == "rejected":
+        raise HTTPException(status_code=400, detail=result.detail)
+
+    await session.commit()
+
+    if result.status == "created":
+        mark_summary_dirty(current_user.shop_id, sale_time(sale, datetime.now()).date())
+
+    # A retried checkout returns the bill created by the first attempt
+    if result.status == "duplicate":
+        response.status_code = status.HTTP_200_OK
+
+    return result
+
+@router.post("/sync", response_model=List[SaleResult])
+@route_budget(9)
+async def sync_sales(
+    sales: List[Sale],
+    session: AsyncSession = Depends(get_session),
+    current_user: Users = Depends(get_current_user)
+):
+    if len(sales) > MAX_SYNC_SALES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_SYNC_SALES} sales can be synced at once"
+        )
+
+    # Offline sales must carry their own key, otherwise a retried sync would double-write
+    if any(not sale.idempotency_key for sale in sales):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Every synced sale needs an idempotency_key"
+        )
+    check_sale_products(sales)
+
+    results = await record_sales(session, sales, current_user)
+    await session.commit()
+
+    now = datetime.now()
+    for sale, result in zip(sales, results):
+        if result.status == "created":
+            mark_summary_dirty(current_user.shop_id, sale_time(sale, now).date())
+
+    return results
@@ -1,51 +1,74 @@
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from utils.models import Shop_Types, Users
 from utils.database import get_session
+from utils.helper_etag import catalog_version
+from utils.helper_response_cache import CachedResponse, body_version, cached_json_response, invalidate_responses, render_json
+from utils.helper_query_budget import route_budget
 from routes.auth import get_current_user 
 
 router = APIRouter(prefix="/shops", tags=["Shop Types"])
 
 @router.get("/types", response_model=List[Shop_Types])
-async def get_shop_Types(session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(Shop_Types))
-    return result.scalars().all()
+@route_budget(2)
+async def get_shop_Types(
+    request: Request,
+    session: AsyncSession = Depends(get_session)
+):
+    async def build() -> CachedResponse:
+        version = await catalog_version(session, Shop_Types)
+        result = await session.execute(select(Shop_Types))
+        return CachedResponse(version.etag, version.last_modified, render_json(result.scalars().all()))
+
+    # Rendered once and shared by every worker through Redis until a write invalidates it; built
+    # from the primary, as a lagging replica could otherwise refill the cache with the old list
+    return await cached_json_response(request, "shop_types:list", build)
 
 @router.get("/types/{shop_type_id}", response_model=Shop_Types)
+@route_budget(1)
 async def get_shop_type(
     shop_type_id: int,
+    request: Request,
     session: AsyncSession = Depends(get_session)
 ):
-    statement = select(Shop_Types).where(Shop_Types.id == shop_type_id)    
-    result = await session.execute(statement)
-    shop_type = result.scalar_one_or_none()
+    async def build() -> CachedResponse:
+        statement = select(Shop_Types).where(Shop_Types.id == shop_type_id)    
+        result = await session.execute(statement)
+        shop_type = result.scalar_one_or_none()
 
-    if not shop_type:
-        raise HTTPException(status_code=404, detail="Shop type not found")
+        if not shop_type:
+            raise HTTPException(status_code=404, detail="Shop type not found")
 
-    return shop_type
+        body = render_json(shop_type)
+        version = body_version(body, shop_type.updated_at)
+        return CachedResponse(version.etag, version.last_modified, body)
+
+    return await cached_json_response(request, f"shop_types:{shop_type_id}", build)
 
 @router.post("/types", response_model=Shop_Types, status_code=201)
+@route_budget(3)
 async def create_shop_type(
     shop_type: Shop_Types,
     session: AsyncSession = Depends(get_session),
     current_user: Users = Depends(get_current_user)
 ):
-    if current_user.user_level.level != 0:
+    if current_user.user_level_id != 0:
         raise HTTPException(status_code=403, detail="Only super-admin can create Shop_Types")
     
     shop_type.created_by = current_user.id
     session.add(shop_type)
     await session.commit()
     await session.refresh(shop_type)
+    await invalidate_responses("shop_types:list")
     return shop_type
 
 @router.patch("/types/{shop_type_id}", response_model=Shop_Types)
+@route_budget(4)
 async def update_shop_type(
     shop_type_id: int,
     shop_type_update: Shop_Types,
@@ -85,5 +108,6 @@ async def update_shop_type(
     session.add(db_shop_type)
     await session.commit()
     await session.refresh(db_shop_type)
+    await invalidate_responses("shop_types:list", f"shop_types:{shop_type_id}")
 
     return db_shop_type
\ No newline at end of file
@@ -1,76 +1,99 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
 from utils.models import Shops, Users
 from utils.database import get_session
+from utils.helper_replica import get_read_session
 from routes.auth import get_current_user
+from utils.helper_json import ORJSONResponse, row_dicts
+from utils.helper_pagination import Page, get_page, keyset_paginate, next_page
+from utils.helper_tenant import TenantScope, get_tenant_scope, in_company, invalidate_tenant_scope, require_company
+from utils.helper_query_budget import route_budget
+from utils.helper_updates import partial_update
+from utils.helper_versioning import get_if_match, version_etag
+from utils.schemas import ShopRow
 
 router = APIRouter(prefix="/shops", tags=["Shops"])
 
-@router.get("/")
+# Columns of a shop listing row
+SHOP_ROW_COLUMNS = (
+    Shops.id,
+    Shops.name,
+    Shops.location,
+    Shops.company_id,
+    Shops.shop_type_id,
+    Shops.phone_1,
+    Shops.phone_2,
+    Shops.paybill,
+    Shops.account_no,
+    Shops.till_no,
+    Shops.updated_at
+)
+
+@router.get("/", response_model=List[ShopRow], response_class=ORJSONResponse)
+@route_budget(3)
 async def get_shops(
-    session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    response: Response,
+    company_id: Optional[int] = None,
+    shop_type_id: Optional[int] = None,
+    name: Optional[str] = None,
+    page: Page = Depends(get_page),
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
     # Super-admin (level 0) sees ALL Shops
-    if current_user.user_level_id == 0:
-        statement = select(Shops)
+    if scope.user_level_id == 0:
+        statement = select(*SHOP_ROW_COLUMNS)
     # Admin user (level 1) & Supervisor (level 2) sees shops their company owns
-    elif current_user.user_level_id in [1, 2]:
-        user_shop_statement =(
-            select(Shops)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
-        )
-        shop_result = await session.execute(user_shop_statement)
-        user_shop = shop_result.scalar_one_or_none()
-        
+    elif scope.user_level_id in [1, 2]:
         statement = (
-            select(Shops)
-            .where(Shops.company_id == user_shop.company_id)
+            select(*SHOP_ROW_COLUMNS)
+            .where(in_company(Shops.company_id, scope))
         )
     else:
         # Normal user: only see the shop they are attached to
         statement = (
-            select(Shops)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
+            select(*SHOP_ROW_COLUMNS)
+            .where(Shops.id == scope.shop_id)
         )
 
+    if company_id is not None:
+        statement = statement.where(Shops.company_id == company_id)
+    if shop_type_id is not None:
+        statement = statement.where(Shops.shop_type_id == shop_type_id)
+    if name:
+        statement = statement.where(Shops.name.istartswith(name, autoescape=True))
+
+    statement = keyset_paginate(statement, [Shops.id], page)
     result = await session.execute(statement)
-    shops = result.scalars().all()
+    shops = next_page(response, row_dicts(result), page, lambda shop: [shop["id"]])
 
-    if not shops:
+    if not shops and not page.cursor:
         raise HTTPException(status_code=404, detail="No shops found")
 
-    return shops
+    return ORJSONResponse(shops, headers=response.headers)
 
 @router.get("/{shop_id}")
+@route_budget(3)
 async def get_shop(
     shop_id: int,
-    session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
     # Super-admin (level 0) sees ALL Shops
-    if current_user.user_level_id == 0:
+    if scope.user_level_id == 0:
         statement = select(Shops).where(Shops.id == shop_id)
         
     # Admin user (level 1) & Supervisor (level 2) sees shops of their company
-    elif current_user.user_level_id in [1, 2]:
-        user_shop_statement =(
-            select(Shops)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
-        )
-        shop_result = await session.execute(user_shop_statement)
-        user_shop = shop_result.scalar_one_or_none()
-        
+    elif scope.user_level_id in [1, 2]:
         statement = (
             select(Shops)
-            .where(Shops.company_id == user_shop.company_id)
+            .where(in_company(Shops.company_id, scope))
             .where(Shops.id == shop_id)
         )
            
@@ -78,9 +101,8 @@ async def get_shop(
         # Normal user: only see the shop they are attached to
         statement = (
             select(Shops)
-            .join(Users, Users.shop_id == Shops.id)
             .where(Shops.id == shop_id)
-            .where(Users.shop_id == shop_id)
+            .where(Shops.id == scope.shop_id)
         )
 
     result = await session.execute(statement)
@@ -89,9 +111,11 @@ async def get_shop(
     if not shop:
         raise HTTPException(status_code=404, detail="Shop not found")
 
+    response.headers["ETag"] = version_etag(shop.version)
     return shop
 
 @router.post("/", response_model=Shops, status_code=201)
+@route_budget(3)
 async def create_shop(
     shop: Shops, 
     session: AsyncSession = Depends(get_session),
@@ -116,11 +140,15 @@ async def create_shop(
 
 
 @router.patch("/{shop_id}", response_model=Shops)
+@route_budget(4)
 async def update_shop(
     shop_id: int,
     shop_update: Shops,
+    response: Response,
+    expected_versions: Optional[Set[int]] = Depends(get_if_match),
     session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    current_user: Users = Depends(get_current_user),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
 
     # Only super-admin & admin (user_level_id in 0, 1) can update shopa
@@ -130,50 +158,19 @@ async def update_shop(
             detail="Only super-admin & admin can update Shops"
         )
 
-    # Fetch the existing shop
-    statement = select(Shops).where(Shops.id == shop_id)
-    result = await session.execute(statement)
-    db_shop = result.scalar_one_or_none()
-
-    if not db_shop:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Shop not found"
-        )
-    
-    
+    criteria = [Shops.id == shop_id]
     #if admin level is 1, restrict to only update own company shops
     if current_user.user_level_id == 1:
-        # Verify that the shop belongs to the user's company
-        user_shop_statement =(
-            select(Shops)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Shops.company_id == db_shop.company_id)
-            .where(Users.id == current_user.id)
-        )
-        shop_result = await session.execute(user_shop_statement)
-        user_shop = shop_result.scalar_one_or_none()
-        if not user_shop:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Admin can only update their own company shops"
-            )
-
-    # Get the update data as dict (only fields that were sent)
-    update_data = shop_update.model_dump(exclude_unset=True)
-
-    # Update fields (excluding protected ones like id, created_at, etc.)
-    for key, value in update_data.items():
-        if key not in {"id", "created_at", "created_by", "updated_at", "updated_by"}:  # Protect audit fields
-            setattr(db_shop, key, value)
-
-    # Update audit fields
-    db_shop.updated_by = current_user.id
-    db_shop.updated_at = datetime.now()
-    
-    # Commit changes
-    session.add(db_shop)
+        require_company(scope)
+        criteria.append(Shops.company_id == scope.company_id)
+
+    db_shop = await partial_update(
+        session, Shops, shop_update, criteria, current_user.id, "Shop", expected_versions
+    )
     await session.commit()
-    await session.refresh(db_shop)
 
+    # The shop may have moved to another company
+    await invalidate_tenant_scope(db_shop["id"])
+
+    response.headers["ETag"] = version_etag(db_shop["version"])
     return db_shop
\ No newline at end of file
@@ -1,41 +1,162 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import List, Literal, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
-from utils.models import Products, Product_Categories, Stock, Users
-from utils.database import get_session
+from utils.models import Products, Product_Categories, Stock, Stock_Balances, Users
+from utils.database import async_read_session, get_session
+from utils.helper_replica import get_read_session
 from routes.auth import get_current_user
+from utils.helper_json import ORJSONResponse, row_dicts
+from utils.helper_ledger import load_on_hand, lock_shop_stock, record_movements, stock_row_movements
+from utils.helper_pagination import Page, get_page, keyset_paginate, next_page
+from utils.helper_rollover import rollover_stock
+from utils.helper_stock_sheet import (
+    invalidate_all_stock_sheets, invalidate_stock_sheet, parse_stock_date, stock_sheet_response
+)
+from utils.helper_summary import mark_summary_dirty
+from utils.schemas import StockRow, StockSheet, StockSheetRow, StockTake, StockTakeResult
+from utils.helper_query_budget import route_budget
+from utils.helper_updates import partial_update
+from utils.helper_versioning import get_if_match, version_etag
 
 router = APIRouter(prefix="/stock", tags=["Stock"])
 
-@router.get("/")
+EXPORT_BATCH_SIZE = 1000
+# Rows per INSERT statement; keeps bind parameters well under the Postgres limit of 32767
+STOCK_TAKE_CHUNK_SIZE = 1000
+# Items per stock-take; the rows then fit one upsert and one balance upsert, as the route budget assumes
+MAX_STOCK_TAKE_ITEMS = STOCK_TAKE_CHUNK_SIZE
+
+@router.get("/", response_model=List[StockRow], response_class=ORJSONResponse)
+@route_budget(2)
 async def get_stocks(
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    product_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    page: Page = Depends(get_page),
+    session: AsyncSession = Depends(get_read_session),
     current_user: Users = Depends(get_current_user)
 ):
+    # Only the listed columns, as plain rows rather than Stock entities: rows go straight to orjson
     statement = (
-        select(Stock, Products)
+        select(
+            Stock.id,
+            Stock.stock_date,
+            Stock.product_id,
+            Products.name.label("product_name"),
+            Products.category_id,
+            Stock.purchase_price,
+            Stock.selling_price,
+            Stock.opening,
+            Stock.additions,
+            Stock.updated_at
+        )
         .join(Products, Stock.product_id == Products.id)
         .where(Stock.shop_id == current_user.shop_id)
     )
 
+    if date_from is not None:
+        statement = statement.where(Stock.stock_date >= date_from)
+    if date_to is not None:
+        statement = statement.where(Stock.stock_date <= date_to)
+    if product_id is not None:
+        statement = statement.where(Stock.product_id == product_id)
+    if category_id is not None:
+        statement = statement.where(Products.category_id == category_id)
+
+    statement = keyset_paginate(statement, [Stock.stock_date, Stock.id], page)
     result = await session.execute(statement)
-    stocks = result.scalars().all()
-    
-    print(stocks)
+    stocks = next_page(response, row_dicts(result), page, lambda stock: [stock["stock_date"], stock["id"]])
 
-    if not stocks:
+    if not stocks and not page.cursor:
         raise HTTPException(status_code=404, detail="No stocks found")
 
-    return stocks
+    # Returned as a ready response, so the cursor header is carried over explicitly
+    return ORJSONResponse(stocks, headers=response.headers)
+
+
+async def stream_stock_export(statement, export_format: str):
+    # Uses its own session: the request-scoped one is closed before a streamed body is sent
+    async with async_read_session() as session:
+        # Server-side cursor, fetched in batches so memory stays flat whatever the date range
+        result = await session.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(result.keys())
+            yield buffer.getvalue()
+
+            async for rows in result.partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(rows)
+                yield buffer.getvalue()
+        else:
+            async for rows in result.partitions():
+                yield "".join(
+                    json.dumps(row._asdict(), default=str) + "\n"
+                    for row in rows
+                )
+
+
+@router.get("/export")
+@route_budget(2)
+async def export_stocks(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: Users = Depends(get_current_user)
+):
+    statement = (
+        select(
+            Stock.stock_date,
+            Stock.product_id,
+            Products.name.label("product_name"),
+            Products.category_id,
+            Product_Categories.name.label("category_name"),
+            Stock.opening,
+            Stock.additions,
+            Stock.purchase_price,
+            Stock.selling_price
+        )
+        .join(Products, Stock.product_id == Products.id)
+        .outerjoin(Product_Categories, Products.category_id == Product_Categories.id)
+        .where(Stock.shop_id == current_user.shop_id)
+        .order_by(Stock.stock_date, Stock.id)
+    )
+
+    if date_from is not None:
+        statement = statement.where(Stock.stock_date >= date_from)
+    if date_to is not None:
+        statement = statement.where(Stock.stock_date <= date_to)
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_stock_export(statement, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="stock.{export_format}"'}
+    )
 
 
 @router.get("/{stock_id}")
+@route_budget(2)
 async def get_stock(
     stock_id: int,
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     current_user: Users = Depends(get_current_user)
 ):
     statement = (
@@ -51,57 +172,39 @@ async def get_stock(
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
 
+    response.headers["ETag"] = version_etag(stock.version)
     return stock
 
 
-@router.get("/filter/{stock_date}")
+@router.get("/sheet/{stock_date}", response_model=StockSheet)
+@route_budget(2)
+async def get_stock_sheet(
+    stock_date: str,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    current_user: Users = Depends(get_current_user)
+):
+    # Built from the primary: a lagging replica could otherwise refill the cache with a stale sheet
+    return await stock_sheet_response(
+        request, session, current_user.shop_id, parse_stock_date(stock_date), "columns"
+    )
+
+
+@router.get("/filter/{stock_date}", response_model=List[StockSheetRow])
+@route_budget(2)
 async def get_stock_by_date(
     stock_date: str,
+    request: Request,
     session: AsyncSession = Depends(get_session),
     current_user: Users = Depends(get_current_user)
 ):
-    
-    #convert stock_date string to date object
-    stock_date = datetime.strptime(stock_date, "%Y-%m-%d").date()
-    
-    if not stock_date:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")    
-    
-    statement = (
-        select(Stock, 
-               Products.name.label("product_name" ), 
-               Products.category_id.label("category_id"), 
-               Product_Categories.name.label("category_name")
-            )
-        .join(Products, Stock.product_id == Products.id)
-        .join(Product_Categories, Products.category_id == Product_Categories.id)
-        .where(Stock.shop_id == current_user.shop_id)
-        .where(Stock.stock_date == stock_date)
+    # Same sheet as /stock/sheet/{stock_date}, one object per row
+    return await stock_sheet_response(
+        request, session, current_user.shop_id, parse_stock_date(stock_date), "rows"
     )
-    
-    result = await session.execute(statement)
-    stocks = result.all()
-
-    if not stocks:
-        raise HTTPException(status_code=404, detail="No Stock found")
-
-    # Transform into clean list of dicts
-    stock_list = []
-    for stock, product_name, category_id, category_name in stocks:
-        stock_dict = {
-            "id": stock.id,
-            "product_id": stock.product_id,
-            "product_name": product_name,
-            "category_id": category_id,
-            "category_name": category_name,
-            "opening": stock.opening,  
-            "additions": stock.additions
-        }
-        stock_list.append(stock_dict)
-
-    return stock_list
 
 @router.post("/", response_model=Stock, status_code=201)
+@route_budget(7)
 async def create_stock(
     Stock: Stock, 
     session: AsyncSession = Depends(get_session),
@@ -115,19 +218,191 @@ async def create_stock(
             detail="Only super-admin, admin & supervisor can create Stock"
         )
 
+    await lock_shop_stock(session, Stock.shop_id)
+    on_hand = (await load_on_hand(session, Stock.shop_id, [Stock.product_id])).get(Stock.product_id, 0)
+    # Without a counted opening the row opens at the balance on hand
+    if Stock.opening is None:
+        Stock.opening = on_hand
+
     session.add(Stock)
     try:
-        await session.commit()
-        await session.refresh(Stock)
+        await session.flush()
     except IntegrityError as ie:
         raise HTTPException(status_code=400, detail="Stock already exists") from ie
+
+    movements = stock_row_movements(
+        Stock.id, Stock.stock_date, Stock.product_id, None, (Stock.opening, Stock.additions), on_hand
+    )
+    await record_movements(session, Stock.shop_id, movements, current_user.id)
+    await session.commit()
+    await session.refresh(Stock)
+
+    mark_summary_dirty(Stock.shop_id, Stock.stock_date)
+    await invalidate_stock_sheet(Stock.shop_id, Stock.stock_date)
     return Stock
 
 
+@router.post("/bulk", response_model=List[StockTakeResult])
+@route_budget(6)
+async def bulk_stock_take(
+    stock_take: StockTake,
+    session: AsyncSession = Depends(get_session),
+    current_user: Users = Depends(get_current_user)
+):
+
+    # Only super-admin, admins & supervisors (user_level_id in 0, 1, 2) can create Stock
+    if current_user.user_level_id not in [0, 1, 2]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super-admin, admin & supervisor can create Stock"
+        )
+    if len(stock_take.items) > MAX_STOCK_TAKE_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_STOCK_TAKE_ITEMS} products can be counted at once"
+        )
+
+    # Last entry wins when a product is sent twice; a single upsert cannot touch a row twice
+    items = {item.product_id: item for item in stock_take.items}
+
+    # The values read below are replaced and turned into movements; nobody may change them meanwhile
+    await lock_shop_stock(session, current_user.shop_id)
+
+    # Only products of the caller's shop can be stocked. Fields left out of an item keep the
+    # day's stored value, or fall back to the product's prices and zero quantities.
+    statement = (
+        select(
+            Products.id,
+            Stock.id.label("stock_id"),
+            func.coalesce(Stock.purchase_price, Products.purchase_price).label("purchase_price"),
+            func.coalesce(Stock.selling_price, Products.selling_price).label("selling_price"),
+            # A new row opens at the balance on hand unless the count says otherwise
+            func.coalesce(Stock.opening, Stock_Balances.on_hand, 0).label("opening"),
+            func.coalesce(Stock.additions, 0).label("additions"),
+            func.coalesce(Stock_Balances.on_hand, 0).label("on_hand")
+        )
+        .outerjoin(Stock, and_(
+            Stock.product_id == Products.id,
+            Stock.shop_id == current_user.shop_id,
+            Stock.stock_date == stock_take.stock_date
+        ))
+        .outerjoin(Stock_Balances, and_(
+            Stock_Balances.product_id == Products.id,
+            Stock_Balances.shop_id == current_user.shop_id
+        ))
+        .where(Products.shop_id == current_user.shop_id)
+        .where(Products.id.in_(items.keys()))
+    )
+    result = await session.execute(statement)
+    products = {row.id: row for row in result.all()}
+
+    now = datetime.now()
+    rows = []
+    results = []
+    # Rows go out in product order so concurrent stock-takes of a shop lock them in the same
+    # order and queue behind each other instead of deadlocking
+    for product_id, item in sorted(items.items()):
+        product = products.get(product_id)
+        if product is None:
+            results.append(StockTakeResult(product_id=product_id, status="rejected", detail="Product not found"))
+            continue
+        rows.append({
+            "stock_date": stock_take.stock_date,
+            "product_id": product_id,
+            "shop_id": current_user.shop_id,
+            "opening": item.opening if item.opening is not None else product.opening,
+            "additions": item.additions if item.additions is not None else product.additions,
+            "purchase_price": item.purchase_price if item.purchase_price is not None else product.purchase_price,
+            "selling_price": item.selling_price if item.selling_price is not None else product.selling_price,
+            "created_at": now,
+            "created_by": current_user.id,
+            "updated_at": now,
+            "updated_by": current_user.id
+        })
+
+    # INSERT ... ON CONFLICT (stock_date, product_id, shop_id) DO UPDATE, all chunks in one transaction
+    for start in range(0, len(rows), STOCK_TAKE_CHUNK_SIZE):
+        statement = insert(Stock).values(rows[start:start + STOCK_TAKE_CHUNK_SIZE])
+        statement = statement.on_conflict_do_update(
+            index_elements=[Stock.stock_date, Stock.product_id, Stock.shop_id],
+            set_={
+                "opening": statement.excluded.opening,
+                "additions": statement.excluded.additions,
+                "purchase_price": statement.excluded.purchase_price,
+                "selling_price": statement.excluded.selling_price,
+                "updated_at": statement.excluded.updated_at,
+                "updated_by": statement.excluded.updated_by,
+                "version": Stock.version + 1
+            }
+        ).returning(Stock.id, Stock.product_id, literal_column("xmax = 0").label("created"))
+
+        result = await session.execute(statement)
+        results.extend(
+            StockTakeResult(product_id=row.product_id, id=row.id, status="created" if row.created else "updated")
+            for row in result.all()
+        )
+
+    stock_ids = {result.product_id: result.id for result in results if result.id is not None}
+    movements = []
+    for row in rows:
+        product = products[row["product_id"]]
+        before = (product.opening, product.additions) if product.stock_id is not None else None
+        movements.extend(stock_row_movements(
+            stock_ids[row["product_id"]], stock_take.stock_date, row["product_id"], before, (row["opening"], row["additions"]),
+            product.on_hand
+        ))
+    await record_movements(session, current_user.shop_id, movements, current_user.id)
+
+    await session.commit()
+
+    mark_summary_dirty(current_user.shop_id, stock_take.stock_date)
+    await invalidate_stock_sheet(current_user.shop_id, stock_take.stock_date)
+    return results
+
+
+@router.post("/rollover")
+@route_budget(3)
+async def rollover(
+    stock_date: Optional[date] = None,
+    all_shops: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user: Users = Depends(get_current_user)
+):
+
+    # Only super-admin, admins & supervisors (user_level_id in 0, 1, 2) can roll over Stock
+    if current_user.user_level_id not in [0, 1, 2]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super-admin, admin & supervisor can roll over Stock"
+        )
+
+    # Only super-admin can roll over every shop at once
+    if all_shops and current_user.user_level_id != 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super-admin can roll over all shops"
+        )
+
+    stock_date = stock_date or date.today()
+    created = await rollover_stock(session, stock_date, None if all_shops else current_user.shop_id)
+    await session.commit()
+
+    if all_shops:
+        await invalidate_all_stock_sheets()
+    else:
+        mark_summary_dirty(current_user.shop_id, stock_date)
+        await invalidate_stock_sheet(current_user.shop_id, stock_date)
+
+    return {"stock_date": stock_date, "created": created}
+
+
 @router.patch("/{stock_id}", response_model=Stock)
+@route_budget(5)
 async def update_stock(
     stock_id: int,
     stock_update: Stock,
+    response: Response,
+    expected_versions: Optional[Set[int]] = Depends(get_if_match),
     session: AsyncSession = Depends(get_session),
     current_user: Users = Depends(get_current_user)
 ):
@@ -139,36 +414,41 @@ async def update_stock(
             detail="Only super-admin, admin & supervisor can update Stock"
         )
 
-    # Fetch the existing Stock
-    statement = (
-        select(Stock)
-        .where(Stock.shop_id == current_user.shop_id)
-        .where(Stock.id == stock_id)
-    )
-
-    result = await session.execute(statement)
-    db_Stock = result.scalar_one_or_none()
-
-    if not db_Stock:
+    # Moving a row to another shop would take its stock out of one ledger without entering it in the other
+    if "shop_id" in stock_update.model_fields_set and stock_update.shop_id != current_user.shop_id:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Stock not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Stock cannot be moved to another Shop; transfer it instead"
         )
 
-    # Get the update data as dict (only fields that were sent)
-    update_data = stock_update.model_dump(exclude_unset=True)
+    # The values replaced below turn into movements; no other stock write may change them meanwhile
+    await lock_shop_stock(session, current_user.shop_id)
 
-    # Update fields (excluding protected ones like id, created_at, etc.)
-    for key, value in update_data.items():
-        if key not in {"id", "created_at", "created_by", "updated_at", "updated_by"}:  # Protect audit fields
-            setattr(db_Stock, key, value)
+    # Another cashier's edit since the client read the row is refused, not overwritten
+    db_Stock = await partial_update(
+        session, Stock, stock_update, [Stock.shop_id == current_user.shop_id, Stock.id == stock_id],
+        current_user.id, "Stock", expected_versions,
+        previous=(Stock.stock_date, Stock.product_id, Stock.opening, Stock.additions)
+    )
+
+    previous_product_id = db_Stock["previous_product_id"]
+    before = (db_Stock["previous_opening"], db_Stock["previous_additions"])
+    after = (db_Stock["opening"], db_Stock["additions"])
+    if db_Stock["product_id"] == previous_product_id:
+        movements = stock_row_movements(stock_id, db_Stock["stock_date"], previous_product_id, before, after)
+    else:
+        # Moved to another product: the old one gives its quantities back, the new one takes them on
+        movements = stock_row_movements(stock_id, db_Stock["stock_date"], previous_product_id, before, (0, 0))
+        movements += stock_row_movements(stock_id, db_Stock["stock_date"], db_Stock["product_id"], (0, 0), after)
+    await record_movements(session, current_user.shop_id, movements, current_user.id)
 
-    # Update audit fields
-    db_Stock.updated_by = current_user.id
-    db_Stock.updated_at = datetime.now()
-    # Commit changes
-    session.add(db_Stock)
     await session.commit()
-    await session.refresh(db_Stock)
 
+    mark_summary_dirty(current_user.shop_id, db_Stock["stock_date"])
+    await invalidate_stock_sheet(current_user.shop_id, db_Stock["stock_date"])
+    # A changed stock_date moves the row off the old day's sheet
+    if db_Stock["previous_stock_date"] != db_Stock["stock_date"]:
+        await invalidate_stock_sheet(current_user.shop_id, db_Stock["previous_stock_date"])
+
+    response.headers["ETag"] = version_etag(db_Stock["version"])
     return db_Stock
\ No newline at end of file
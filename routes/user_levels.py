@@ -1,25 +1,39 @@
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from utils.models import User_Levels, Users
 from utils.database import get_session
+from utils.helper_etag import catalog_version, conditional_response
+from utils.helper_replica import get_read_session
+from utils.helper_query_budget import route_budget
 from routes.auth import get_current_user 
 
 router = APIRouter(prefix="/users", tags=["User Levels"])
 
 @router.get("/levels/", response_model=List[User_Levels])
-async def get_user_levels(session: AsyncSession = Depends(get_session)):
+@route_budget(2)
+async def get_user_levels(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session)
+):
+    # Answer revalidations from the table's version before loading anything
+    not_modified = conditional_response(request, response, await catalog_version(session, User_Levels))
+    if not_modified:
+        return not_modified
+
     result = await session.execute(select(User_Levels))
     return result.scalars().all()
 
 @router.get("/levels/{user_level_id}", response_model=User_Levels)
+@route_budget(1)
 async def get_user_level(
     user_level_id: int,
-    session: AsyncSession = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
     statement = select(User_Levels).where(User_Levels.id == user_level_id)    
     result = await session.execute(statement)
@@ -31,6 +45,7 @@ async def get_user_level(
     return user_level
 
 @router.post("/levels/", response_model=User_Levels, status_code=201)
+@route_budget(3)
 async def create_user_level(
     user_level: User_Levels,
     session: AsyncSession = Depends(get_session),
@@ -48,6 +63,7 @@ async def create_user_level(
     return user_level
 
 @router.patch("/levels/{user_level_id}", response_model=User_Levels)
+@route_budget(4)
 async def update_user_level(
     user_level_id: int,
     user_level_update: User_Levels,
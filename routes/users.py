@@ -1,100 +1,122 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
 from utils.models import Shops, Users
 from utils.database import get_session
+from utils.helper_replica import get_read_session
 from routes.auth import get_current_user
+from utils.helper_auth import invalidate_principal
+from utils.helper_json import ORJSONResponse, row_dicts
+from utils.helper_password import hash_password
+from utils.helper_pagination import Page, get_page, keyset_paginate, next_page
+from utils.helper_tenant import TenantScope, get_tenant_scope, in_company, require_company
+from utils.helper_query_budget import route_budget
+from utils.helper_updates import partial_update
+from utils.helper_versioning import get_if_match, version_etag
+from utils.schemas import UserRow
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-@router.get("/")
-async def get_shops(
-    session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+# Columns of a user row; never the password hash
+USER_ROW_COLUMNS = (
+    Users.id,
+    Users.name,
+    Users.phone,
+    Users.shop_id,
+    Users.user_level_id,
+    Users.updated_at,
+    Users.version
+)
+
+@router.get("/", response_model=List[UserRow], response_class=ORJSONResponse)
+@route_budget(3)
+async def get_users(
+    response: Response,
+    shop_id: Optional[int] = None,
+    user_level_id: Optional[int] = None,
+    name: Optional[str] = None,
+    page: Page = Depends(get_page),
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
     # Super-admin (level 0) sees ALL Users
-    if current_user.user_level_id == 0:
-        statement = select(Users)
+    if scope.user_level_id == 0:
+        statement = select(*USER_ROW_COLUMNS)
     # Admin user (level 1) sees users of their company
-    elif current_user.user_level_id in [1, 2]:
-        user_shop_statement =(
-            select(Shops)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
-        )
-        shop_result = await session.execute(user_shop_statement)
-        user_shop = shop_result.scalar_one_or_none()
-        
+    elif scope.user_level_id in [1, 2]:
         statement = (
-            select(Users)
+            select(*USER_ROW_COLUMNS)
             .join(Shops, Users.shop_id == Shops.id)            
-            .where(Shops.company_id == user_shop.company_id)
+            .where(in_company(Shops.company_id, scope))
         )
         
     else:
         # Normal user: only see users in their own shop
         statement = (
-            select(Users)
-            .join(Shops, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
+            select(*USER_ROW_COLUMNS)
+            .where(Users.id == scope.user_id)
         )
 
+    if shop_id is not None:
+        statement = statement.where(Users.shop_id == shop_id)
+    if user_level_id is not None:
+        statement = statement.where(Users.user_level_id == user_level_id)
+    if name:
+        statement = statement.where(Users.name.istartswith(name, autoescape=True))
+
+    statement = keyset_paginate(statement, [Users.id], page)
     result = await session.execute(statement)
-    shops = result.scalars().all()
+    users = next_page(response, row_dicts(result), page, lambda user: [user["id"]])
 
-    if not shops:
+    if not users and not page.cursor:
         raise HTTPException(status_code=404, detail="No users found")
 
-    return shops
+    return ORJSONResponse(users, headers=response.headers)
 
-@router.get("/{user_id}")
+@router.get("/{user_id}", response_model=UserRow)
+@route_budget(3)
 async def get_user(
     user_id: int,
-    session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
     # Super-admin (level 0) sees ALL Users
-    if current_user.user_level_id == 0:
-        statement = select(Users).where(Users.id == user_id)
+    if scope.user_level_id == 0:
+        statement = select(*USER_ROW_COLUMNS).where(Users.id == user_id)
 
     # Admin user (level 1) & Supervisor (level 2) sees users of their company
-    elif current_user.user_level_id in [1, 2]:
-        user_shop_statement =(
-            select(Shops)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Users.id == current_user.id)
-        )
-        shop_result = await session.execute(user_shop_statement)
-        user_shop = shop_result.scalar_one_or_none()
-
+    elif scope.user_level_id in [1, 2]:
         statement = (
-            select(Users)
+            select(*USER_ROW_COLUMNS)
             .join(Shops, Users.shop_id == Shops.id)
-            .where(Shops.company_id == user_shop.company_id)
+            .where(in_company(Shops.company_id, scope))
             .where(Users.id == user_id)
         )
 
     else:
         # Normal user: only see users in their own shop
         statement = (
-            select(Users)
-            .join(Shops, Users.shop_id == Shops.id)
+            select(*USER_ROW_COLUMNS)
             .where(Users.id == user_id)
-            .where(Users.shop_id == current_user.shop_id)
+            .where(Users.shop_id == scope.shop_id)
         )
 
     result = await session.execute(statement)
-    user = result.scalar_one_or_none()
+    user = result.mappings().one_or_none()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    response.headers["ETag"] = version_etag(user["version"])
     return user
 
-@router.post("/", response_model=Users, status_code=201)
+@router.post("/", response_model=UserRow, status_code=201)
+@route_budget(3)
 async def create_user(
     user: Users, 
     session: AsyncSession = Depends(get_session),
@@ -109,6 +131,10 @@ async def create_user(
             detail="Only super-admin & admin can create shops"
         )
 
+    # Table models are not validated from the body, so the password may be missing or not a string
+    if not isinstance(user.password, str) or not user.password:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid password")
+    user.password = await hash_password(user.password)
     session.add(user)
     try:
         await session.commit()
@@ -118,12 +144,16 @@ async def create_user(
     return user
 
 
-@router.patch("/{user_id}", response_model=Users)
+@router.patch("/{user_id}", response_model=UserRow)
+@route_budget(4)
 async def update_user(
     user_id: int,
     user_update: Users,
+    response: Response,
+    expected_versions: Optional[Set[int]] = Depends(get_if_match),
     session: AsyncSession = Depends(get_session),
-    current_user: Users = Depends(get_current_user)
+    current_user: Users = Depends(get_current_user),
+    scope: TenantScope = Depends(get_tenant_scope)
 ):
 
     # Only super-admin & admin (user_level_id in 0, 1) can update shopa
@@ -133,50 +163,23 @@ async def update_user(
             detail="Only super-admin & admin can update Users"
         )
 
-    # Fetch the existing user
-    statement = select(Users).where(Users.id == user_id)
-    result = await session.execute(statement)
-    db_user = result.scalar_one_or_none()
-
-    if not db_user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    
+    criteria = [Users.id == user_id]
     #if admin level is 1, restrict to only update own company users
     if current_user.user_level_id == 1:
-        # Verify that the shop belongs to the user's company
-        user_shop_statement =(
-            select(Shops)
-            .join(Users, Users.shop_id == Shops.id)
-            .where(Shops.company_id == db_user.shop.company_id)
-            .where(Users.id == current_user.id)
-        )
-        shop_result = await session.execute(user_shop_statement)
-        user_shop = shop_result.scalar_one_or_none()
-        if not user_shop:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Admin can only update their own company users"
-            )
-
-    # Get the update data as dict (only fields that were sent)
-    update_data = user_update.model_dump(exclude_unset=True)
-
-    # Update fields (excluding protected ones like id, created_at, etc.)
-    for key, value in update_data.items():
-        if key not in {"id", "created_at", "created_by", "updated_at", "updated_by"}:  # Protect audit fields
-            setattr(db_user, key, value)
-
-    # Update audit fields
-    db_user.updated_by = current_user.id
-    db_user.updated_at = datetime.now()
-
-    # Commit changes
-    session.add(db_user)
+        require_company(scope)
+        criteria.append(Users.shop_id.in_(select(Shops.id).where(Shops.company_id == scope.company_id)))
+
+    # Anything but a string is left for partial_update to reject
+    if "password" in user_update.model_fields_set and isinstance(user_update.password, str):
+        user_update.password = await hash_password(user_update.password)
+
+    db_user = await partial_update(
+        session, Users, user_update, criteria, current_user.id, "User", expected_versions
+    )
     await session.commit()
-    await session.refresh(db_user)
 
+    # Drop the cached principal so the change is visible on the user's next request
+    await invalidate_principal(db_user["id"])
+
+    response.headers["ETag"] = version_etag(db_user["version"])
     return db_user
\ No newline at end of file
@@ -1,29 +1,106 @@
-from sqlmodel import SQLModel
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from uuid import uuid4
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 import os
 from dotenv import load_dotenv
 
+from utils.helper_migrations import run_migrations
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica; GET endpoints read from it when set
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
 
-# Add connect_args to disable prepared statement cache
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,
-    future=True,
-    connect_args={"statement_cache_size": 0} 
-)
+def env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+# Pool sizing is per uvicorn worker: total connections = workers * (size + overflow)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", "True")
+# Leave pooling entirely to PgBouncer / the Supabase pooler
+DB_NULL_POOL = env_flag("DB_NULL_POOL", "False")
+# "pgbouncer" (transaction pooler), "direct" (plain Postgres) or "auto" (pgbouncer on port 6543)
+DB_CONNECTION_MODE = os.getenv("DB_CONNECTION_MODE", "auto")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))
+
+def is_pgbouncer(url: str) -> bool:
+    if DB_CONNECTION_MODE != "auto":
+        return DB_CONNECTION_MODE == "pgbouncer"
+    return make_url(url).port == 6543
+
+def build_engine(url: str) -> AsyncEngine:
+    connect_args = {"command_timeout": DB_COMMAND_TIMEOUT}
+    if is_pgbouncer(url):
+        # A transaction pooler hands each transaction a different server connection,
+        # so prepared statements must not be cached or reuse names across connections
+        connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__"
+        })
+    else:
+        # Direct connections keep their prepared statements, skipping re-parsing hot queries
+        connect_args.update({
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE
+        })
+
+    if DB_NULL_POOL:
+        pool_args = {"poolclass": NullPool}
+    else:
+        pool_args = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING
+        }
+
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        connect_args=connect_args,
+        **pool_args
+    )
+
+engine = build_engine(DATABASE_URL)
+read_engine = build_engine(DATABASE_READ_URL) if DATABASE_READ_URL else engine
 
 async_session = sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
 )
 
+async_read_session = sessionmaker(
+    bind=read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 async def init_db():
+    # create_all only builds missing tables; indexes and keys added later come from migrations
     async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+        await run_migrations(conn)
 
 async def get_session() -> AsyncSession:
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+def pool_stats(db_engine: AsyncEngine = engine) -> dict:
+    pool = db_engine.sync_engine.pool
+    if isinstance(pool, NullPool):
+        return {"pool": pool.__class__.__name__}
+    return {
+        "pool": pool.__class__.__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout": DB_POOL_TIMEOUT
+    }
\ No newline at end of file
@@ -1,5 +1,4 @@
 
-import hashlib
 import os
 from datetime import datetime, timedelta
 from typing import Optional
@@ -8,9 +7,11 @@ import jwt
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
+from sqlmodel import select, update
 
 from utils.database import get_session
+from utils.helper_cache import TieredCache
+from utils.helper_password import hash_password, verify_password
 from utils.models import Users
 
 
@@ -18,26 +19,53 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Authenticated principals keyed by user id, so get_current_user skips the DB on a hit
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# Invalidation only reaches Redis and the worker that made the change; a demoted user keeps
+# their old level on every other worker for up to this long
+PRINCIPAL_LOCAL_TTL = int(os.getenv("PRINCIPAL_LOCAL_TTL", "5"))
+principal_cache = TieredCache(
+    "principal", maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL, local_ttl=PRINCIPAL_LOCAL_TTL
+)
+
 bearer_scheme = HTTPBearer()
 
-def hash_password(password):
-    password_bytes = password.encode('utf-8')
-    hash_object = hashlib.sha256(password_bytes)
-    return hash_object.hexdigest()
-    
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.now() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def token_subject(token: str) -> Optional[int]:
+    # User id of a valid token, without raising; for routing decisions rather than auth
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return int(payload["sub"])
+    except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+        return None
+
 async def authenticate_user(phone: str, password: str, session: AsyncSession) -> Users | None:
     statement = select(Users).where(Users.phone == phone)
     result = await session.execute(statement)
     user = result.scalar_one_or_none()
-    if user and user.password == hash_password(password):
-        return user
-    return None
+    if not user:
+        return None
+
+    valid, needs_rehash = await verify_password(password, user.password)
+    if not valid:
+        return None
+
+    # Transparently upgrade legacy SHA-256 (or weaker scrypt) hashes while we know the password
+    if needs_rehash:
+        user.password = await hash_password(password)
+        await session.execute(
+            update(Users).where(Users.id == user.id).values(password=user.password)
+        )
+        await session.commit()
+        await invalidate_principal(user.id)
+
+    return user
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
@@ -53,10 +81,19 @@ async def get_current_user(
     except (jwt.ExpiredSignatureError, jwt.PyJWTError, ValueError) as e:
         raise HTTPException(status_code=401, detail="Invalid or expired token") from e
 
+    cached_user = await principal_cache.get(user_id)
+    if cached_user is not None:
+        # The password hash is never cached; only login reads it, straight from the DB
+        return Users.model_validate(cached_user, update={"password": ""})
+
     statement = select(Users).where(Users.id == user_id)
     result = await session.execute(statement)
     user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    
-    return user
\ No newline at end of file
+
+    await principal_cache.set(user_id, user.model_dump(mode="json", exclude={"password"}))
+    return user
+
+async def invalidate_principal(user_id: int):
+    await principal_cache.delete(user_id)
\ No newline at end of file
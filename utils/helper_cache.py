@@ -0,0 +1,159 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from dotenv import load_dotenv
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+load_dotenv()
+
+REDIS_HOSTNAME = os.getenv("REDIS_HOSTNAME")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+REDIS_SSL = os.getenv("REDIS_SSL", "False").lower() in ("1", "true", "yes")
+
+_redis_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    # Redis is optional: without REDIS_HOSTNAME every cache stays in-process only
+    global _redis_client
+    if not REDIS_HOSTNAME:
+        return None
+    if _redis_client is None:
+        _redis_client = aioredis.Redis(
+            host=REDIS_HOSTNAME,
+            port=REDIS_PORT,
+            password=REDIS_PASSWORD,
+            ssl=REDIS_SSL,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5,
+        )
+    return _redis_client
+
+
+class TTLCache:
+    """In-process LRU cache whose entries expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self, prefix: str = ""):
+        if not prefix:
+            self._data.clear()
+            return
+        for key in [key for key in self._data if str(key).startswith(prefix)]:
+            del self._data[key]
+
+
+class TieredCache:
+    """TTLCache in front of an optional shared Redis tier.
+
+    Values are kept as-is in process and stored in Redis through `dumps`/`loads`.
+    Redis errors are swallowed so a Redis outage only costs a cache miss.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int = 1024,
+        ttl: float = 60,
+        dumps: Callable[[Any], Any] = json.dumps,
+        loads: Callable[[Any], Any] = json.loads,
+        local_ttl: Optional[float] = None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        # Caps the in-process copy: deletes reach Redis and this worker, never the other workers
+        self.local_ttl = local_ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.dumps = dumps
+        self.loads = loads
+
+    def _key(self, key) -> str:
+        return f"easy-stock:{self.namespace}:{key}"
+
+    async def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            raw = await redis.get(self._key(key))
+        except RedisError:
+            return None
+        if raw is None:
+            return None
+
+        value = self.loads(raw)
+        self.local.set(key, value, self.local_ttl)
+        return value
+
+    async def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        local_ttl = ttl
+        if self.local_ttl is not None:
+            local_ttl = min(ttl, self.local_ttl) if ttl else self.local_ttl
+        self.local.set(key, value, local_ttl)
+
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(self._key(key), self.dumps(value), ex=max(1, int(ttl)) if ttl else None)
+        except RedisError:
+            pass
+
+    async def delete(self, key):
+        self.local.delete(key)
+
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.delete(self._key(key))
+        except RedisError:
+            pass
+
+    async def clear(self, prefix: str = ""):
+        # With a prefix, only keys starting with it; SCANs Redis, so keep it off hot paths
+        self.local.clear(prefix)
+
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            async for redis_key in redis.scan_iter(match=self._key(f"{prefix}*")):
+                await redis.delete(redis_key)
+        except RedisError:
+            pass
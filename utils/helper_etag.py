@@ -0,0 +1,67 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel, select
+
+
+class CatalogVersion(SQLModel):
+    etag: str
+    last_modified: Optional[datetime] = None
+
+    @property
+    def headers(self) -> dict:
+        # no-cache: clients may keep the body but must revalidate, which costs one cheap query
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+
+async def catalog_version(session: AsyncSession, model, *criteria, scope: str = "") -> CatalogVersion:
+    """Version of a table (or the rows matching `criteria`) without loading them.
+
+    count and max(id) change on inserts and deletes, max(updated_at) on edits; `scope`
+    keeps equal versions of differently scoped results (e.g. two shops) apart.
+    """
+    statement = select(func.count(), func.max(model.id), func.max(model.updated_at)).where(*criteria)
+    result = await session.execute(statement)
+    count, max_id, max_updated_at = result.one()
+
+    digest = hashlib.sha1(f"{model.__tablename__}:{scope}:{count}:{max_id}:{max_updated_at}".encode("utf-8"))
+    last_modified = None
+    if max_updated_at is not None:
+        # Stored as naive server-local time; HTTP dates are whole seconds in GMT
+        last_modified = max_updated_at.astimezone(timezone.utc).replace(microsecond=0)
+    return CatalogVersion(etag=f'W/"{digest.hexdigest()[:20]}"', last_modified=last_modified)
+
+
+def is_not_modified(request: Request, version: CatalogVersion) -> bool:
+    # If-None-Match takes precedence; If-Modified-Since is only consulted without it (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" and "x" match
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return version.etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and version.last_modified is not None:
+        try:
+            return version.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_response(request: Request, response: Response, version: CatalogVersion) -> Optional[Response]:
+    """Sets the validators on `response`; returns a 304 to send instead when the client is current."""
+    if is_not_modified(request, version):
+        return Response(status_code=304, headers=version.headers)
+    response.headers.update(version.headers)
+    return None
\ No newline at end of file
@@ -0,0 +1,28 @@
+from typing import Any, List
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def orjson_default(value: Any):
+    # orjson covers dicts, lists, dates and datetimes natively; models are the only extra
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON rendered by orjson, for handlers that return plain rows and skip response-model validation.
+
+    Defined here rather than imported from FastAPI, which has deprecated its own. Handlers
+    with a response_model are better left on the default, which FastAPI serializes in Rust.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def row_dicts(result) -> List[dict]:
+    # Plain dicts straight from result.mappings(): no ORM identity map, no model validation
+    return [dict(row) for row in result.mappings()]
\ No newline at end of file
@@ -0,0 +1,137 @@
+from datetime import date, datetime
+from typing import Dict, List, Literal, NamedTuple, Optional
+
+from sqlalchemy import case, func, insert, null
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.models import Stock_Balances, Stock_Movements
+
+MovementType = Literal["purchase", "sale", "adjustment", "transfer"]
+
+# Arbitrary class key for pg_advisory_xact_lock(key, shop_id): one stock-row writer per shop at a time
+STOCK_WRITE_LOCK_ID = 720_004
+# Balance rows per upsert; five bind parameters each, well under the Postgres limit of 32767
+BALANCE_CHUNK_SIZE = 1000
+
+
+class Movement(NamedTuple):
+    product_id: int
+    # Signed change to the quantity on hand
+    quantity: float
+    movement_type: MovementType
+    stock_date: date
+    reference_id: Optional[int] = None
+
+
+async def lock_shop_stock(session: AsyncSession, *shop_ids: int):
+    # Stock writes turn the values they replace into movements, so those must not change underneath them.
+    # Several shops are locked in id order, so writers spanning the same shops queue instead of deadlocking.
+    for shop_id in sorted(set(shop_ids)):
+        await session.execute(select(func.pg_advisory_xact_lock(STOCK_WRITE_LOCK_ID, shop_id)))
+
+
+async def record_movements(
+    session: AsyncSession,
+    shop_id: int,
+    movements: List[Movement],
+    user_id: int
+) -> Dict[int, float]:
+    """Append `movements` to the ledger and move the shop's balances with them, in the caller's transaction.
+
+    Each product's balance row is upserted once for the batch's net change, in product
+    order, so concurrent writers lock balances in the same order instead of deadlocking.
+    Every movement is stored with the balance it left behind. Returns the new on-hand
+    quantity of every product touched.
+    """
+    movements = [movement for movement in movements if movement.quantity]
+    if not movements:
+        return {}
+    now = datetime.now()
+
+    net: Dict[int, float] = {}
+    for movement in movements:
+        net[movement.product_id] = net.get(movement.product_id, 0) + movement.quantity
+
+    rows = [
+        {
+            "shop_id": shop_id,
+            "product_id": product_id,
+            "on_hand": quantity,
+            "out_of_stock_since": now if quantity <= 0 else None,
+            "updated_at": now
+        }
+        for product_id, quantity in sorted(net.items())
+    ]
+    balances = {}
+    for start in range(0, len(rows), BALANCE_CHUNK_SIZE):
+        statement = pg_insert(Stock_Balances).values(rows[start:start + BALANCE_CHUNK_SIZE])
+        on_hand = Stock_Balances.on_hand + statement.excluded.on_hand
+        statement = statement.on_conflict_do_update(
+            index_elements=[Stock_Balances.shop_id, Stock_Balances.product_id],
+            set_={
+                "on_hand": on_hand,
+                # Keeps the time it first ran out while it stays out
+                "out_of_stock_since": case(
+                    (on_hand > 0, null()),
+                    else_=func.coalesce(Stock_Balances.out_of_stock_since, statement.excluded.updated_at)
+                ),
+                "updated_at": statement.excluded.updated_at
+            }
+        ).returning(Stock_Balances.product_id, Stock_Balances.on_hand)
+        result = await session.execute(statement)
+        balances.update({row.product_id: row.on_hand for row in result.all()})
+
+    # Replay the batch forward from each product's balance before it
+    running = {product_id: balances[product_id] - quantity for product_id, quantity in net.items()}
+    entries = []
+    for movement in movements:
+        running[movement.product_id] += movement.quantity
+        entries.append({
+            "shop_id": shop_id,
+            "product_id": movement.product_id,
+            "movement_type": movement.movement_type,
+            "quantity": movement.quantity,
+            "balance_after": running[movement.product_id],
+            "stock_date": movement.stock_date,
+            "reference_id": movement.reference_id,
+            "created_at": now,
+            "created_by": user_id
+        })
+    await session.execute(insert(Stock_Movements), entries)
+
+    return balances
+
+
+async def load_on_hand(session: AsyncSession, shop_id: int, product_ids) -> Dict[int, float]:
+    statement = (
+        select(Stock_Balances.product_id, Stock_Balances.on_hand)
+        .where(Stock_Balances.shop_id == shop_id)
+        .where(Stock_Balances.product_id.in_(product_ids))
+    )
+    result = await session.execute(statement)
+    return {row.product_id: row.on_hand for row in result.all()}
+
+
+def stock_row_movements(
+    stock_id: int,
+    stock_date: date,
+    product_id: int,
+    before: Optional[tuple],
+    after: tuple,
+    on_hand: float = 0
+) -> List[Movement]:
+    """Movements implied by a stock row changing from `before` to `after` (opening, additions).
+
+    Additions are goods received: a change is a purchase. A changed opening on an existing
+    row is a corrected count: an adjustment. A new row (`before` None) is a count too: its
+    opening is adjusted against the product's current balance, `on_hand`. Only rows the
+    rollover creates carry the close over without a movement, and it does not come here.
+    """
+    before_opening, before_additions = before if before is not None else (on_hand, 0)
+    after_opening, after_additions = after
+    return [
+        Movement(product_id, (after_opening or 0) - (before_opening or 0), "adjustment", stock_date, stock_id),
+        Movement(product_id, (after_additions or 0) - (before_additions or 0), "purchase", stock_date, stock_id),
+    ]
\ No newline at end of file
@@ -0,0 +1,227 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.database import engine, pool_stats, read_engine
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their SQL; 0 disables the log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, labels, None, value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [per-bucket counts, sum, count]
+        self.values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", labels, ("le", format_value(bound)), cumulative
+            yield f"{self.name}_sum", labels, None, total
+            yield f"{self.name}_count", labels, None, count
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Per-request DB counters; SQLAlchemy's async greenlets share the request's context
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+http_requests = Counter("http_requests_total", "Requests handled, by route and status")
+http_in_progress = Gauge("http_requests_in_progress", "Requests currently being handled")
+http_latency = Histogram("http_request_duration_seconds", "Request latency until the response is fully sent", LATENCY_BUCKETS)
+http_response_size = Histogram("http_response_size_bytes", "Response body size", SIZE_BUCKETS)
+request_queries = Histogram("http_request_db_queries", "Database statements executed per request", QUERY_COUNT_BUCKETS)
+request_db_time = Histogram("http_request_db_seconds", "Time spent in the database per request", LATENCY_BUCKETS)
+db_query_latency = Histogram("db_query_duration_seconds", "Duration of single database statements", LATENCY_BUCKETS)
+db_slow_queries = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS")
+db_pool = Gauge("db_pool_connections", "Connection pool usage")
+
+METRICS = [
+    http_requests, http_in_progress, http_latency, http_response_size,
+    request_queries, request_db_time, db_query_latency, db_slow_queries, db_pool
+]
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    elapsed = time.perf_counter() - started
+    db_query_latency.observe(elapsed)
+
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        db_slow_queries.inc()
+        logger.warning("Slow query (%.0f ms): %s", elapsed * 1000, " ".join(statement.split()))
+
+
+def handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(db_engine: AsyncEngine):
+    sync_engine = db_engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(sync_engine, "handle_error", handle_error)
+
+
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed bodies are timed and sized until the last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        http_in_progress.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_progress.dec(method=method)
+            request_stats.reset(token)
+
+            # Label by route template, not the raw path, to keep the series count bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(method=method, route=path, status=str(status_code))
+            http_latency.observe(elapsed, method=method, route=path)
+            http_response_size.observe(size, method=method, route=path)
+            request_queries.observe(stats.queries, method=method, route=path)
+            request_db_time.observe(stats.db_seconds, method=method, route=path)
+
+
+def update_pool_metrics():
+    engines = {"primary": engine}
+    if read_engine is not engine:
+        engines["replica"] = read_engine
+    for name, db_engine in engines.items():
+        stats = pool_stats(db_engine)
+        for state in ("size", "checked_in", "checked_out", "overflow"):
+            if state in stats:
+                db_pool.set(stats[state], engine=name, state=state)
+
+
+def render_metrics() -> str:
+    update_pool_metrics()
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, extra, value in metric.samples():
+            lines.append(f"{name}{format_labels(labels, extra)} {format_value(value)}")
+    return "\n".join(lines) + "\n"
\ No newline at end of file
@@ -0,0 +1,205 @@
+import logging
+import re
+from datetime import datetime
+from typing import List, NamedTuple, Tuple
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlmodel import SQLModel, select
+
+from utils.models import Schema_Migrations
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock so workers starting together migrate one at a time
+MIGRATIONS_LOCK_ID = 720_003
+
+INDEX_STATEMENT = re.compile(r"CREATE (UNIQUE )?INDEX IF NOT EXISTS (\w+) ON (\w+) \(([^)]*)\)")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+
+def add_foreign_key(table: str, column: str, ref_table: str) -> str:
+    # Same name Postgres gives the constraint when create_all makes a fresh table, so either way
+    # there is one. NOT VALID enforces it for new writes without scanning or locking existing rows;
+    # run ALTER TABLE ... VALIDATE CONSTRAINT once legacy data is known to be clean.
+    name = f"{table}_{column}_fkey"
+    return f"""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{name}' AND conrelid = '{table}'::regclass) THEN
+                ALTER TABLE {table} ADD CONSTRAINT {name}
+                    FOREIGN KEY ({column}) REFERENCES {ref_table} (id) NOT VALID;
+            END IF;
+        END $$
+    """
+
+
+def require_unique(table: str, columns: str) -> str:
+    # Runs ahead of a unique index: fails naming one duplicate instead of leaving the index build to
+    # fail on it. Only reads, so it was added to migrations that had already shipped.
+    return f"""
+        DO $$
+        DECLARE duplicate text;
+        BEGIN
+            SELECT ROW({columns})::text INTO duplicate FROM {table} GROUP BY {columns} HAVING count(*) > 1 LIMIT 1;
+            IF FOUND THEN
+                RAISE EXCEPTION 'Rows of {table} share ({columns}) = %, so its unique index cannot be built; merge or remove the duplicates first', duplicate;
+            END IF;
+        END $$
+    """
+
+
+# Append only: never edit or reorder a migration once it has shipped. Schema statements are
+# no-ops on a fresh database, where create_all already built the tables with their indexes and keys.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "indexes declared before migrations", (
+        require_unique("stock", "stock_date, product_id, shop_id"),
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_stock_date_product_shop ON stock (stock_date, product_id, shop_id)",
+        "CREATE INDEX IF NOT EXISTS ix_bill_items_shop_date_product ON bill_items (shop_id, stock_date, product_id)",
+        require_unique("idempotency_keys", "shop_id, key"),
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_idempotency_keys_shop_key ON idempotency_keys (shop_id, key)",
+        require_unique("shop_daily_summary", "shop_id, summary_date"),
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_shop_daily_summary_shop_date ON shop_daily_summary (shop_id, summary_date)",
+    )),
+    Migration(2, "indexes for the tenant-scoped lookups", (
+        "CREATE INDEX IF NOT EXISTS ix_stock_shop_date ON stock (shop_id, stock_date, id)",
+        "CREATE INDEX IF NOT EXISTS ix_products_shop_category ON products (shop_id, category_id)",
+        "CREATE INDEX IF NOT EXISTS ix_product_categories_shop_id ON product_categories (shop_id)",
+        # Keeps the app from starting while two users share a phone: resolve those first
+        require_unique("users", "phone"),
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_phone ON users (phone)",
+        "CREATE INDEX IF NOT EXISTS ix_users_shop_id ON users (shop_id)",
+        "CREATE INDEX IF NOT EXISTS ix_shops_company_id ON shops (company_id)",
+        "CREATE INDEX IF NOT EXISTS ix_bills_shop_created_at ON bills (shop_id, created_at)",
+    )),
+    Migration(3, "foreign keys", (
+        add_foreign_key("shops", "company_id", "companies"),
+        add_foreign_key("shops", "shop_type_id", "shop_types"),
+        add_foreign_key("product_categories", "shop_id", "shops"),
+        add_foreign_key("products", "category_id", "product_categories"),
+        add_foreign_key("products", "shop_id", "shops"),
+        add_foreign_key("stock", "product_id", "products"),
+        add_foreign_key("stock", "shop_id", "shops"),
+        add_foreign_key("bill_items", "bill_id", "bills"),
+        add_foreign_key("bill_items", "product_id", "products"),
+        add_foreign_key("payments", "bill_id", "bills"),
+    )),
+    Migration(4, "opening stock balances", (
+        # On hand per shop and product: the latest day's opening + additions - that day's sales
+        """
+        INSERT INTO stock_balances (shop_id, product_id, on_hand, out_of_stock_since, updated_at)
+        SELECT latest.shop_id, latest.product_id, latest.on_hand,
+               CASE WHEN latest.on_hand <= 0 THEN LOCALTIMESTAMP END, LOCALTIMESTAMP
+        FROM (
+            SELECT DISTINCT ON (stock.shop_id, stock.product_id)
+                   stock.shop_id, stock.product_id,
+                   COALESCE(stock.opening, 0) + COALESCE(stock.additions, 0) - COALESCE((
+                       SELECT sum(bill_items.quantity) FROM bill_items
+                       WHERE bill_items.shop_id = stock.shop_id
+                         AND bill_items.stock_date = stock.stock_date
+                         AND bill_items.product_id = stock.product_id
+                   ), 0) AS on_hand
+            FROM stock
+            ORDER BY stock.shop_id, stock.product_id, stock.stock_date DESC
+        ) AS latest
+        ON CONFLICT (shop_id, product_id) DO NOTHING
+        """,
+        # The ledger opens with one adjustment per balance, so balances always equal the movements' sum
+        """
+        INSERT INTO stock_movements (shop_id, product_id, movement_type, quantity, balance_after,
+                                     stock_date, created_at, created_by)
+        SELECT shop_id, product_id, 'adjustment', on_hand, on_hand, CURRENT_DATE, LOCALTIMESTAMP, 0
+        FROM stock_balances
+        WHERE on_hand <> 0
+        """,
+    )),
+    # A constant default: existing rows take it without the table being rewritten
+    Migration(5, "row versions for optimistic updates", tuple(
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1"
+        for table in ("users", "licenses", "companies", "shops", "products", "stock")
+    )),
+]
+
+
+async def run_migrations(conn: AsyncConnection) -> List[int]:
+    """Create missing tables, then apply pending migrations in order, within `conn`'s transaction.
+
+    Other workers block on the lock until this one commits, so none of them serves
+    requests against a half-migrated schema. Returns the versions applied.
+    """
+    await conn.execute(select(func.pg_advisory_xact_lock(MIGRATIONS_LOCK_ID)))
+    await conn.run_sync(SQLModel.metadata.create_all)
+
+    result = await conn.execute(select(Schema_Migrations.version))
+    applied = set(result.scalars().all())
+
+    pending = [migration for migration in MIGRATIONS if migration.version not in applied]
+    for migration in sorted(pending, key=lambda migration: migration.version):
+        logger.info("Applying migration %s: %s", migration.version, migration.name)
+        for statement in migration.statements:
+            await conn.exec_driver_sql(statement)
+        await conn.execute(
+            insert(Schema_Migrations).values(version=migration.version, name=migration.name, applied_at=datetime.now())
+        )
+    return [migration.version for migration in pending]
+
+
+async def build_indexes(db_engine: AsyncEngine) -> List[str]:
+    """Build the indexes of pending migrations with CREATE INDEX CONCURRENTLY, ahead of a deploy.
+
+    Writes carry on while they build. Startup then finds them in place and its IF NOT EXISTS
+    statements do nothing, instead of blocking writes to a large table until an index is built.
+    Unique indexes are checked for duplicates first, as in the migrations. Returns the names
+    of the indexes built.
+    """
+    async with db_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        applied = set()
+        if (await conn.execute(text("SELECT to_regclass('schema_migrations')"))).scalar() is not None:
+            result = await conn.execute(select(Schema_Migrations.version))
+            applied = set(result.scalars().all())
+
+        built = []
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                continue
+            for statement in migration.statements:
+                match = INDEX_STATEMENT.search(statement)
+                if match is None:
+                    continue
+                unique, name, table, columns = match.groups()
+                # A fresh database gets the table, with its indexes, from create_all at startup
+                if (await conn.execute(text("SELECT to_regclass(:table)"), {"table": table})).scalar() is None:
+                    continue
+
+                # An interrupted concurrent build leaves an invalid index that IF NOT EXISTS would keep
+                result = await conn.execute(
+                    text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+                )
+                valid = result.scalar_one_or_none()
+                if valid:
+                    continue
+                if valid is False:
+                    await conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+                if unique:
+                    await conn.exec_driver_sql(require_unique(table, columns))
+                logger.info("Building index %s", name)
+                await conn.exec_driver_sql(statement.replace("INDEX IF NOT EXISTS", "INDEX CONCURRENTLY IF NOT EXISTS", 1))
+                built.append(name)
+    return built
+
+
+if __name__ == "__main__":
+    # python -m utils.helper_migrations: run against DATABASE_URL before starting the new release
+    import asyncio
+
+    from utils.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"built {len(asyncio.run(build_indexes(engine)))} indexes")
\ No newline at end of file
@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import tuple_
+from sqlmodel import SQLModel
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Sort keys are 4-byte integer columns; a cursor value outside them would fail in the database
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class Page(SQLModel):
+    cursor: Optional[str] = None
+    limit: int = DEFAULT_PAGE_SIZE
+
+
+def get_page(
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} response header"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+) -> Page:
+    return Page(cursor=cursor, limit=limit)
+
+
+def encode_cursor(values: list) -> str:
+    payload = json.dumps(values, default=lambda value: value.isoformat())
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the sort key")
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type in (date, datetime):
+                value = python_type.fromisoformat(value)
+            # Exact types only (a bool is not an id), and ids within the integer columns' range
+            if type(value) is not python_type or (python_type is int and not INT_MIN <= value <= INT_MAX):
+                raise ValueError(f"cursor value does not fit {column.key}")
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def keyset_paginate(statement, columns: list, page: Page):
+    # Seek past the last row of the previous page instead of OFFSET, so every page costs the same
+    if page.cursor:
+        values = decode_cursor(page.cursor, columns)
+        statement = statement.where(tuple_(*columns) > tuple_(*values))
+    # One extra row tells us whether there is a next page
+    return statement.order_by(*columns).limit(page.limit + 1)
+
+
+def next_page(response: Response, rows: List, page: Page, key: Callable[[object], list]) -> List:
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
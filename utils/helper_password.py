@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+# Threads hashing at once; scrypt releases the GIL so these run in parallel
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash requests allowed to wait for a thread before new ones are turned away with 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+class PasswordHasher(ABC):
+    scheme = ""
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        ...
+
+    @abstractmethod
+    def verify(self, password: str, hashed: str) -> bool:
+        ...
+
+    @abstractmethod
+    def identify(self, hashed: str) -> bool:
+        ...
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return False
+
+
+class ScryptHasher(PasswordHasher):
+    """Memory-hard hashes stored as scrypt$n$r$p$salt$key, so cost can be raised later."""
+
+    scheme = "scrypt"
+
+    def __init__(self, n: int = PASSWORD_SCRYPT_N, r: int = PASSWORD_SCRYPT_R, p: int = PASSWORD_SCRYPT_P,
+                 salt_size: int = 16, key_size: int = 32):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.salt_size = salt_size
+        self.key_size = key_size
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int, key_size: int) -> bytes:
+        return hashlib.scrypt(
+            password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+            dklen=key_size, maxmem=256 * n * r * p + 1024 * 1024
+        )
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(self.salt_size)
+        key = self._derive(password, salt, self.n, self.r, self.p, self.key_size)
+        return "$".join([
+            self.scheme, str(self.n), str(self.r), str(self.p),
+            base64.b64encode(salt).decode("ascii"), base64.b64encode(key).decode("ascii")
+        ])
+
+    def _parse(self, hashed: str):
+        _, n, r, p, salt, key = hashed.split("$")
+        return int(n), int(r), int(p), base64.b64decode(salt), base64.b64decode(key)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            n, r, p, salt, key = self._parse(hashed)
+        except ValueError:
+            return False
+        return hmac.compare_digest(self._derive(password, salt, n, r, p, len(key)), key)
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith(self.scheme + "$")
+
+    def needs_rehash(self, hashed: str) -> bool:
+        n, r, p, salt, key = self._parse(hashed)
+        return (n, r, p, len(key)) != (self.n, self.r, self.p, self.key_size)
+
+
+class LegacySha256Hasher(PasswordHasher):
+    """Unsalted SHA-256 hex digests from before the KDF; verified only to upgrade them."""
+
+    scheme = "sha256"
+
+    def hash(self, password: str) -> str:
+        return hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return hmac.compare_digest(self.hash(password), hashed)
+
+    def identify(self, hashed: str) -> bool:
+        return len(hashed) == 64 and all(c in "0123456789abcdef" for c in hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return True
+
+
+# The first hasher hashes new passwords; the rest are only used to verify older hashes
+HASHERS = [ScryptHasher(), LegacySha256Hasher()]
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+_pending = 0
+
+
+async def _run_limited(fn, *args):
+    # Bounded queue: under a login storm excess requests fail fast instead of
+    # piling up behind the pool and starving every other request of the worker
+    global _pending
+    if _pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many login attempts, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    _pending += 1
+    try:
+        async with _slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run_limited(HASHERS[0].hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, bool]:
+    """Returns (valid, needs_rehash) for a stored hash of any supported scheme."""
+    for hasher in HASHERS:
+        if hasher.identify(hashed):
+            valid = await _run_limited(hasher.verify, password, hashed)
+            return valid, valid and (hasher is not HASHERS[0] or hasher.needs_rehash(hashed))
+    return False, False
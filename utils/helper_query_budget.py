@@ -0,0 +1,144 @@
+import functools
+import inspect
+import logging
+import os
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from utils.database import engine, read_engine
+
+logger = logging.getLogger(__name__)
+
+# off: no counting; warn: log routes over budget; raise: fail the statement that goes over (tests, debug)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").lower()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class query_budget:
+    """Caps the statements run inside a block, or inside every call of a decorated function.
+
+        with query_budget(2):
+            ...
+
+    Strict budgets raise QueryBudgetExceeded at the first statement over the limit, so the
+    traceback points at the query that was added; otherwise the overrun is logged on exit.
+    """
+
+    def __init__(self, limit: Optional[int], strict: bool = True, label: Optional[str] = None):
+        self.limit = limit
+        self.strict = strict
+        self.label = label or "block"
+        self.count = 0
+        self._token = None
+
+    def current_limit(self) -> Optional[int]:
+        return self.limit
+
+    def describe(self) -> str:
+        return self.label
+
+    def exceeded(self) -> bool:
+        limit = self.current_limit()
+        return limit is not None and self.count > limit
+
+    def _message(self) -> str:
+        return f"{self.describe()} ran {self.count} queries, budget is {self.current_limit()}"
+
+    def __enter__(self):
+        self.count = 0
+        self._token = _active_budgets.set(_active_budgets.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active_budgets.reset(self._token)
+        if exc_type is None and self.exceeded():
+            if self.strict:
+                raise QueryBudgetExceeded(self._message())
+            logger.warning(self._message())
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, fn):
+        label = self.label if self.label != "block" else fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with query_budget(self.limit, self.strict, label):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with query_budget(self.limit, self.strict, label):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class RouteBudget(query_budget):
+    # The route is only known once the router has matched, which happens after this is entered
+    def __init__(self, scope: dict, strict: bool):
+        super().__init__(None, strict)
+        self.scope = scope
+
+    def current_limit(self) -> Optional[int]:
+        route = self.scope.get("route")
+        return getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+    def describe(self) -> str:
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', self.scope['path'])}"
+
+
+# Budgets open in the current context; SQLAlchemy's async greenlets share it with the caller
+_active_budgets: ContextVar[tuple] = ContextVar("query_budgets", default=())
+
+
+def route_budget(limit: int):
+    """Declares how many statements a route may run, counting its dependencies on a cold cache."""
+    def decorator(endpoint):
+        endpoint.query_budget = limit
+        return endpoint
+    return decorator
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    for budget in _active_budgets.get():
+        budget.count += 1
+        if budget.strict and budget.exceeded():
+            raise QueryBudgetExceeded(budget._message())
+
+
+def instrument_engine(db_engine):
+    sync_engine = db_engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", count_query):
+        event.listen(sync_engine, "before_cursor_execute", count_query)
+
+
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
+
+
+class QueryBudgetMiddleware:
+    """Checks every request against its route's declared budget; added only when QUERY_BUDGET_MODE is not off."""
+
+    def __init__(self, app, mode: str = QUERY_BUDGET_MODE):
+        self.app = app
+        self.strict = mode == "raise"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        budget = RouteBudget(scope, self.strict)
+        with budget:
+            await self.app(scope, receive, send)
\ No newline at end of file
@@ -0,0 +1,42 @@
+import os
+from typing import Optional
+
+from fastapi import Depends
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.database import async_read_session, async_session, engine, read_engine
+from utils.helper_auth import token_subject
+from utils.helper_cache import TieredCache
+
+# How long a user's reads stay on the primary after they write, covering replica lag
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+recent_writers = TieredCache("recent-writer", maxsize=10000, ttl=READ_YOUR_WRITES_SECONDS)
+
+optional_bearer = HTTPBearer(auto_error=False)
+
+
+def replica_enabled() -> bool:
+    return read_engine is not engine
+
+
+async def mark_recent_write(token: Optional[str]):
+    if not replica_enabled() or not token:
+        return
+    user_id = token_subject(token)
+    if user_id is not None:
+        await recent_writers.set(user_id, 1)
+
+
+async def get_read_session(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer)
+) -> AsyncSession:
+    session_factory = async_read_session
+    if replica_enabled() and credentials is not None:
+        # Read-your-writes: a user who just wrote keeps reading from the primary for a moment
+        user_id = token_subject(credentials.credentials)
+        if user_id is not None and await recent_writers.get(user_id):
+            session_factory = async_session
+
+    async with session_factory() as session:
+        yield session
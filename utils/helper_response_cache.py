@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from utils.helper_cache import TieredCache
+from utils.helper_etag import CatalogVersion, is_not_modified
+
+# Other workers drop their in-process copy after this long; Redis is invalidated right away
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+    body: bytes
+
+
+def dump_cached_response(entry: CachedResponse) -> bytes:
+    # Validators as a JSON header line, then the body bytes untouched
+    header = {"etag": entry.etag, "last_modified": entry.last_modified.isoformat() if entry.last_modified else None}
+    return json.dumps(header).encode("utf-8") + b"\n" + entry.body
+
+
+def load_cached_response(raw: bytes) -> CachedResponse:
+    header, body = raw.split(b"\n", 1)
+    header = json.loads(header)
+    last_modified = datetime.fromisoformat(header["last_modified"]) if header["last_modified"] else None
+    return CachedResponse(header["etag"], last_modified, body)
+
+
+response_cache = TieredCache(
+    "response", maxsize=1024, ttl=RESPONSE_CACHE_TTL,
+    dumps=dump_cached_response, loads=load_cached_response
+)
+
+
+def render_json(content: Any) -> bytes:
+    # Same bytes FastAPI's JSONResponse would send
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def body_version(body: bytes, updated_at: Optional[datetime] = None) -> CatalogVersion:
+    last_modified = updated_at.astimezone(timezone.utc).replace(microsecond=0) if updated_at else None
+    return CatalogVersion(etag=f'W/"{hashlib.sha1(body).hexdigest()[:20]}"', last_modified=last_modified)
+
+
+async def cached_json_response(
+    request: Request,
+    key: str,
+    build: Callable[[], Awaitable[CachedResponse]],
+    cache: TieredCache = response_cache,
+    ttl: Optional[float] = None
+) -> Response:
+    """Serves `key` from `cache`, calling `build` to render and store it on a miss."""
+    entry = await cache.get(key)
+    if entry is None:
+        entry = await build()
+        await cache.set(key, entry, ttl)
+
+    version = CatalogVersion(etag=entry.etag, last_modified=entry.last_modified)
+    if is_not_modified(request, version):
+        return Response(status_code=304, headers=version.headers)
+    return Response(content=entry.body, media_type="application/json", headers=version.headers)
+
+
+async def invalidate_responses(*keys: str):
+    for key in keys:
+        await response_cache.delete(key)
\ No newline at end of file
@@ -0,0 +1,106 @@
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import exists, func, literal, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.database import async_session
+from utils.helper_stock_sheet import invalidate_all_stock_sheets
+from utils.models import Bill_Items, Products, Shops, Stock
+
+# Arbitrary key for pg_try_advisory_xact_lock so only one worker runs the scheduled rollover
+ROLLOVER_LOCK_ID = 720_001
+
+
+async def rollover_stock(session: AsyncSession, stock_date: date, shop_id: Optional[int] = None) -> int:
+    """Create `stock_date` rows for every product from its latest closing stock.
+
+    Closing stock is the opening + additions of the product's latest day before
+    `stock_date`, minus everything sold since that day began. The latest day is not
+    necessarily yesterday: a shop that was closed, or a missed scheduled run, does not
+    break the chain.
+
+    Runs as one INSERT ... SELECT for a single shop, or for every shop that has stock
+    before `stock_date` when `shop_id` is None. Rows that already exist are left untouched.
+    """
+    now = datetime.now()
+
+    # Walks the shop's days backwards on ix_stock_shop_date, stopping at the product's latest one
+    previous = (
+        select(Stock.stock_date, Stock.opening, Stock.additions, Stock.purchase_price, Stock.selling_price)
+        .where(Stock.shop_id == Products.shop_id)
+        .where(Stock.product_id == Products.id)
+        .where(Stock.stock_date < stock_date)
+        .order_by(Stock.stock_date.desc())
+        .limit(1)
+        .lateral("previous")
+    )
+
+    sold = (
+        select(func.sum(Bill_Items.quantity))
+        .where(Bill_Items.shop_id == Products.shop_id)
+        .where(Bill_Items.product_id == Products.id)
+        .where(Bill_Items.stock_date >= previous.c.stock_date)
+        .where(Bill_Items.stock_date < stock_date)
+        .scalar_subquery()
+    )
+
+    closing = (
+        func.coalesce(previous.c.opening, 0)
+        + func.coalesce(previous.c.additions, 0)
+        - func.coalesce(sold, 0)
+    )
+
+    rows = (
+        select(
+            literal(stock_date),
+            Products.id,
+            Products.shop_id,
+            func.coalesce(Products.purchase_price, previous.c.purchase_price),
+            func.coalesce(Products.selling_price, previous.c.selling_price),
+            closing,
+            literal(0.0),
+            literal(now),
+            literal(0),
+            literal(now)
+        )
+        .select_from(Products)
+        .outerjoin(previous, true())
+    )
+
+    if shop_id is not None:
+        rows = rows.where(Products.shop_id == shop_id)
+    else:
+        has_stock = select(Stock.id).where(Stock.shop_id == Shops.id).where(Stock.stock_date < stock_date)
+        rows = rows.where(Products.shop_id.in_(select(Shops.id).where(exists(has_stock))))
+
+    statement = (
+        insert(Stock)
+        .from_select(
+            ["stock_date", "product_id", "shop_id", "purchase_price", "selling_price",
+             "opening", "additions", "created_at", "created_by", "updated_at"],
+            rows
+        )
+        .on_conflict_do_nothing(index_elements=[Stock.stock_date, Stock.product_id, Stock.shop_id])
+    )
+
+    result = await session.execute(statement)
+    return result.rowcount
+
+
+async def rollover_all_shops():
+    async with async_session() as session:
+        # Every worker runs the scheduler; the first one to take the lock does the work
+        locked = await session.scalar(select(func.pg_try_advisory_xact_lock(ROLLOVER_LOCK_ID)))
+        if not locked:
+            return 0
+
+        created = await rollover_stock(session, date.today())
+        await session.commit()
+
+    # Runs once a day; dropping every cached sheet is simpler than tracking the shops touched
+    if created:
+        await invalidate_all_stock_sheets()
+    return created
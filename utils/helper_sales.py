@@ -0,0 +1,160 @@
+import uuid
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.helper_ledger import Movement, record_movements
+from utils.models import Bill_Items, Bills, Idempotency_Keys, Payments, Products, Users
+from utils.schemas import Sale, SaleResult
+
+
+def sale_time(sale: Sale, now: datetime) -> datetime:
+    sold_at = sale.sold_at or now
+    if sold_at.tzinfo is not None:
+        # Stored like every other timestamp here: naive server-local time
+        sold_at = sold_at.astimezone().replace(tzinfo=None)
+    return sold_at
+
+
+async def record_sales(session: AsyncSession, sales: List[Sale], current_user: Users) -> List[SaleResult]:
+    """Write bills, their items and payments, and take the items out of stock, for a batch of sales in one transaction.
+
+    Each write is a single set-based statement for the whole batch. A sale whose
+    idempotency key was already used for the shop is not written again; its original
+    bill is reported as a duplicate instead.
+    """
+    now = datetime.now()
+    results = {}
+
+    # A sale without a key cannot be retried safely, but still needs one to be tracked here.
+    # A key repeated within the request is written once and reported for every occurrence.
+    keys = [sale.idempotency_key or uuid.uuid4().hex for sale in sales]
+    pending = {}
+    for key, sale in zip(keys, sales):
+        pending.setdefault(key, sale)
+
+    # Prices and ownership of every product in the batch in one query
+    product_ids = {item.product_id for sale in pending.values() for item in sale.items}
+    statement = (
+        select(Products.id, Products.selling_price)
+        .where(Products.shop_id == current_user.shop_id)
+        .where(Products.id.in_(product_ids))
+    )
+    result = await session.execute(statement)
+    prices = {row.id: row.selling_price for row in result.all()}
+
+    def item_price(item) -> float:
+        return item.price if item.price is not None else prices[item.product_id]
+
+    for key, sale in list(pending.items()):
+        if not sale.items:
+            results[key] = SaleResult(idempotency_key=key, status="rejected", detail="Sale has no items")
+            del pending[key]
+        elif any(item.product_id not in prices for item in sale.items):
+            results[key] = SaleResult(idempotency_key=key, status="rejected", detail="Product not found")
+            del pending[key]
+        elif any(item_price(item) is None for item in sale.items):
+            results[key] = SaleResult(idempotency_key=key, status="rejected", detail="Product has no price")
+            del pending[key]
+        elif any(item.quantity <= 0 for item in sale.items):
+            # Returns are not sales; a negative quantity would put goods back into stock
+            results[key] = SaleResult(idempotency_key=key, status="rejected", detail="Quantities must be greater than zero")
+            del pending[key]
+
+    if not pending:
+        return [results[key] for key in keys]
+
+    # Claim the keys first; a concurrent retry of the same sale waits here until we commit
+    statement = (
+        pg_insert(Idempotency_Keys)
+        .values([{"key": key, "shop_id": current_user.shop_id, "created_at": now} for key in pending])
+        .on_conflict_do_nothing(index_elements=[Idempotency_Keys.shop_id, Idempotency_Keys.key])
+        .returning(Idempotency_Keys.key, Idempotency_Keys.id)
+    )
+    result = await session.execute(statement)
+    claimed = {row.key: row.id for row in result.all()}
+
+    duplicates = [key for key in pending if key not in claimed]
+    if duplicates:
+        statement = (
+            select(Idempotency_Keys.key, Bills.id, Bills.total, Bills.paid)
+            .join(Bills, Bills.id == Idempotency_Keys.bill_id)
+            .where(Idempotency_Keys.shop_id == current_user.shop_id)
+            .where(Idempotency_Keys.key.in_(duplicates))
+        )
+        result = await session.execute(statement)
+        for row in result.all():
+            results[row.key] = SaleResult(
+                idempotency_key=row.key, bill_id=row.id, total=row.total, paid=row.paid, status="duplicate"
+            )
+        for key in duplicates:
+            results.setdefault(key, SaleResult(idempotency_key=key, status="duplicate"))
+
+    new_sales = [(key, sale) for key, sale in pending.items() if key in claimed]
+    if new_sales:
+        bills = []
+        for key, sale in new_sales:
+            bills.append({
+                "customer_id": sale.customer_id or 0,
+                "total": sum(item.quantity * item_price(item) for item in sale.items),
+                "paid": sum(payment.amount for payment in sale.payments),
+                "shop_id": current_user.shop_id,
+                "created_at": sale_time(sale, now),
+                "created_by": current_user.id,
+                "updated_at": None
+            })
+
+        result = await session.execute(
+            insert(Bills).returning(Bills.id, sort_by_parameter_order=True), bills
+        )
+        bill_ids = result.scalars().all()
+
+        items = []
+        payments = []
+        for (key, sale), bill_id, bill in zip(new_sales, bill_ids, bills):
+            for item in sale.items:
+                price = item_price(item)
+                items.append({
+                    "bill_id": bill_id,
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                    "price": price,
+                    "total": item.quantity * price,
+                    # The day's stock the sale is taken from
+                    "stock_date": bill["created_at"].date(),
+                    "shop_id": current_user.shop_id,
+                    "created_at": now,
+                    "created_by": current_user.id,
+                    "updated_at": None
+                })
+            for payment in sale.payments:
+                payments.append({
+                    "bill_id": bill_id,
+                    "amount": payment.amount,
+                    "payment_mode_id": payment.payment_mode_id,
+                    "shop_id": current_user.shop_id,
+                    "created_at": now,
+                    "created_by": current_user.id,
+                    "updated_at": None
+                })
+            results[key] = SaleResult(
+                idempotency_key=key, bill_id=bill_id, total=bill["total"], paid=bill["paid"], status="created"
+            )
+
+        await session.execute(insert(Bill_Items), items)
+        await record_movements(session, current_user.shop_id, [
+            Movement(item["product_id"], -item["quantity"], "sale", item["stock_date"], item["bill_id"])
+            for item in items
+        ], current_user.id)
+        if payments:
+            await session.execute(insert(Payments), payments)
+        await session.execute(
+            update(Idempotency_Keys),
+            [{"id": claimed[key], "bill_id": bill_id} for (key, sale), bill_id in zip(new_sales, bill_ids)]
+        )
+
+    return [results[key] for key in keys]
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, time, timedelta
+from typing import Awaitable, Callable, List
+
+from utils.helper_rollover import rollover_all_shops
+from utils.helper_summary import flush_dirty_summaries, refresh_recent_summaries
+
+logger = logging.getLogger(__name__)
+
+STOCK_ROLLOVER_ENABLED = os.getenv("STOCK_ROLLOVER_ENABLED", "True").lower() in ("1", "true", "yes")
+STOCK_ROLLOVER_TIME = time.fromisoformat(os.getenv("STOCK_ROLLOVER_TIME", "00:05"))
+SUMMARY_FLUSH_SECONDS = int(os.getenv("SUMMARY_FLUSH_SECONDS", "30"))
+SUMMARY_REFRESH_SECONDS = int(os.getenv("SUMMARY_REFRESH_SECONDS", "900"))
+
+
+def seconds_until(at: time) -> float:
+    now = datetime.now()
+    next_run = datetime.combine(now.date(), at)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+async def run_daily(job: Callable[[], Awaitable], at: time, run_at_startup: bool = True):
+    # Running once at startup catches up on a rollover missed while the app was down
+    if run_at_startup:
+        await run_job(job)
+    while True:
+        await asyncio.sleep(seconds_until(at))
+        await run_job(job)
+
+
+async def run_every(job: Callable[[], Awaitable], seconds: float):
+    while True:
+        await asyncio.sleep(seconds)
+        await run_job(job)
+
+
+async def run_job(job: Callable[[], Awaitable]):
+    try:
+        await job()
+    except Exception:
+        logger.exception("Background job %s failed", job.__name__)
+
+
+def start_background_jobs() -> List[asyncio.Task]:
+    tasks = []
+    if STOCK_ROLLOVER_ENABLED:
+        tasks.append(asyncio.create_task(run_daily(rollover_all_shops, STOCK_ROLLOVER_TIME)))
+    tasks.append(asyncio.create_task(run_every(flush_dirty_summaries, SUMMARY_FLUSH_SECONDS)))
+    tasks.append(asyncio.create_task(run_every(refresh_recent_summaries, SUMMARY_REFRESH_SECONDS)))
+    return tasks
+
+
+async def stop_background_jobs(tasks: List[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,127 @@
+import os
+from datetime import date
+from typing import List, Literal
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.helper_cache import TieredCache
+from utils.helper_json import ORJSONResponse
+from utils.helper_response_cache import (
+    CachedResponse, body_version, cached_json_response, dump_cached_response, load_cached_response
+)
+from utils.models import Product_Categories, Products, Stock
+
+# Today's sheet keeps changing; past days only change through a correction, which invalidates them
+STOCK_SHEET_TTL = int(os.getenv("STOCK_SHEET_TTL", "300"))
+# Still finite: a build racing a correction can store the sheet from before it, and this is
+# how long that stale copy can outlive the invalidation
+STOCK_SHEET_PAST_TTL = int(os.getenv("STOCK_SHEET_PAST_TTL", "86400"))
+
+SheetFormat = Literal["columns", "rows"]
+SHEET_FORMATS = ("columns", "rows")
+
+stock_sheets = TieredCache(
+    "stock-sheet", maxsize=2048, ttl=STOCK_SHEET_TTL, local_ttl=STOCK_SHEET_TTL,
+    dumps=dump_cached_response, loads=load_cached_response
+)
+
+
+def parse_stock_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.") from e
+
+
+def sheet_key(shop_id: int, stock_date: date, sheet_format: SheetFormat) -> str:
+    return f"{shop_id}:{stock_date.isoformat()}:{sheet_format}"
+
+
+async def load_sheet_rows(session: AsyncSession, shop_id: int, stock_date: date) -> List[tuple]:
+    statement = (
+        select(
+            Stock.id,
+            Stock.product_id,
+            Products.name,
+            Products.category_id,
+            Product_Categories.name,
+            Stock.opening,
+            Stock.additions
+        )
+        .join(Products, Stock.product_id == Products.id)
+        .join(Product_Categories, Products.category_id == Product_Categories.id)
+        .where(Stock.shop_id == shop_id)
+        .where(Stock.stock_date == stock_date)
+        .order_by(Stock.product_id)
+    )
+    result = await session.execute(statement)
+    return result.all()
+
+
+def sheet_columns(stock_date: date, rows: List[tuple]) -> dict:
+    """One array per column, with category names given once in `categories` instead of per row."""
+    ids, product_ids, product_names, category_ids, category_names, openings, additions = (
+        [list(column) for column in zip(*rows)] if rows else [[] for _ in range(7)]
+    )
+    return {
+        "stock_date": stock_date,
+        "count": len(rows),
+        "id": ids,
+        "product_id": product_ids,
+        "product_name": product_names,
+        "category_id": category_ids,
+        "opening": openings,
+        "additions": additions,
+        "categories": dict(zip(category_ids, category_names))
+    }
+
+
+def sheet_rows(rows: List[tuple]) -> List[dict]:
+    # The StockSheetRow shape of /stock/filter/{date}
+    return [
+        {
+            "id": stock_id, "product_id": product_id, "product_name": product_name, "category_id": category_id,
+            "category_name": category_name, "opening": opening, "additions": additions
+        }
+        for stock_id, product_id, product_name, category_id, category_name, opening, additions in rows
+    ]
+
+
+async def stock_sheet_response(
+    request: Request,
+    session: AsyncSession,
+    shop_id: int,
+    stock_date: date,
+    sheet_format: SheetFormat
+) -> Response:
+    """A shop's stock sheet for one day, from cache or from a single projection query."""
+    async def build() -> CachedResponse:
+        rows = await load_sheet_rows(session, shop_id, stock_date)
+        if not rows:
+            raise HTTPException(status_code=404, detail="No Stock found")
+
+        content = sheet_columns(stock_date, rows) if sheet_format == "columns" else sheet_rows(rows)
+        body = ORJSONResponse(content).body
+        version = body_version(body)
+        return CachedResponse(version.etag, version.last_modified, body)
+
+    ttl = STOCK_SHEET_PAST_TTL if stock_date < date.today() else STOCK_SHEET_TTL
+    return await cached_json_response(
+        request, sheet_key(shop_id, stock_date, sheet_format), build, cache=stock_sheets, ttl=ttl
+    )
+
+
+async def invalidate_stock_sheet(shop_id: int, stock_date: date):
+    for sheet_format in SHEET_FORMATS:
+        await stock_sheets.delete(sheet_key(shop_id, stock_date, sheet_format))
+
+
+async def invalidate_shop_stock_sheets(shop_id: int):
+    # Product and category renames show on every day's sheet of the shop
+    await stock_sheets.clear(f"{shop_id}:")
+
+
+async def invalidate_all_stock_sheets():
+    await stock_sheets.clear()
\ No newline at end of file
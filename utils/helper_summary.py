@@ -0,0 +1,156 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy import and_, func, literal, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.database import async_session
+from utils.models import Bill_Items, Bills, Cashbox, Expenses, Shop_Daily_Summary, Shops, Stock
+
+# Arbitrary key for pg_try_advisory_xact_lock so only one worker runs the full refresh
+SUMMARY_LOCK_ID = 720_002
+
+# (shop_id, summary_date) pairs written to since the last flush, per worker
+_dirty: Set[Tuple[int, date]] = set()
+
+
+async def refresh_daily_summary(session: AsyncSession, summary_date: date, shop_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute shop_daily_summary rows for one day with a single INSERT ... SELECT.
+
+    Every shop with stock, sales, expenses or cash on that day gets its row upserted,
+    restricted to `shop_ids` when given.
+    """
+    shop_ids = list(shop_ids) if shop_ids is not None else None
+    day_start = datetime.combine(summary_date, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+
+    def for_shops(statement, shop_column):
+        return statement.where(shop_column.in_(shop_ids)) if shop_ids is not None else statement
+
+    sold = for_shops(
+        select(Bill_Items.shop_id, Bill_Items.product_id, func.sum(Bill_Items.quantity).label("quantity"))
+        .where(Bill_Items.stock_date == summary_date)
+        .group_by(Bill_Items.shop_id, Bill_Items.product_id),
+        Bill_Items.shop_id
+    ).subquery()
+
+    closing = (
+        func.coalesce(Stock.opening, 0)
+        + func.coalesce(Stock.additions, 0)
+        - func.coalesce(sold.c.quantity, 0)
+    )
+    stock = for_shops(
+        select(
+            Stock.shop_id,
+            func.sum(closing * func.coalesce(Stock.purchase_price, 0)).label("value_cost"),
+            func.sum(closing * func.coalesce(Stock.selling_price, 0)).label("value_retail")
+        )
+        .outerjoin(sold, and_(sold.c.shop_id == Stock.shop_id, sold.c.product_id == Stock.product_id))
+        .where(Stock.stock_date == summary_date)
+        .group_by(Stock.shop_id),
+        Stock.shop_id
+    ).subquery()
+
+    sales = for_shops(
+        select(Bills.shop_id, func.sum(Bills.total).label("total"))
+        .where(Bills.created_at >= day_start)
+        .where(Bills.created_at < day_end)
+        .group_by(Bills.shop_id),
+        Bills.shop_id
+    ).subquery()
+
+    # Expenses and Cashbox keep their day as a YYYY-MM-DD string
+    expenses = for_shops(
+        select(Expenses.shop_id, func.sum(Expenses.amount).label("total"))
+        .where(Expenses.date == summary_date.isoformat())
+        .group_by(Expenses.shop_id),
+        Expenses.shop_id
+    ).subquery()
+
+    cashbox = for_shops(
+        select(Cashbox.shop_id, func.sum(Cashbox.cash).label("cash"), func.sum(Cashbox.mpesa).label("mpesa"))
+        .where(Cashbox.date == summary_date.isoformat())
+        .group_by(Cashbox.shop_id),
+        Cashbox.shop_id
+    ).subquery()
+
+    rows = for_shops(
+        select(
+            Shops.id,
+            literal(summary_date),
+            func.coalesce(stock.c.value_cost, 0),
+            func.coalesce(stock.c.value_retail, 0),
+            func.coalesce(sales.c.total, 0),
+            func.coalesce(expenses.c.total, 0),
+            func.coalesce(cashbox.c.cash, 0),
+            func.coalesce(cashbox.c.mpesa, 0),
+            func.now()
+        )
+        .outerjoin(stock, stock.c.shop_id == Shops.id)
+        .outerjoin(sales, sales.c.shop_id == Shops.id)
+        .outerjoin(expenses, expenses.c.shop_id == Shops.id)
+        .outerjoin(cashbox, cashbox.c.shop_id == Shops.id)
+        .where(or_(
+            stock.c.shop_id.isnot(None),
+            sales.c.shop_id.isnot(None),
+            expenses.c.shop_id.isnot(None),
+            cashbox.c.shop_id.isnot(None)
+        )),
+        Shops.id
+    )
+
+    statement = insert(Shop_Daily_Summary).from_select(
+        ["shop_id", "summary_date", "stock_value_cost", "stock_value_retail",
+         "sales", "expenses", "cash", "mpesa", "updated_at"],
+        rows
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[Shop_Daily_Summary.shop_id, Shop_Daily_Summary.summary_date],
+        set_={
+            column: statement.excluded[column]
+            for column in ("stock_value_cost", "stock_value_retail", "sales", "expenses", "cash", "mpesa", "updated_at")
+        }
+    )
+
+    result = await session.execute(statement)
+    return result.rowcount
+
+
+def mark_summary_dirty(shop_id: int, summary_date: date):
+    # Writes only mark the day; flush_dirty_summaries recomputes it in the background
+    _dirty.add((shop_id, summary_date))
+
+
+async def flush_dirty_summaries():
+    if not _dirty:
+        return
+    pending = set(_dirty)
+    _dirty.difference_update(pending)
+
+    by_date = {}
+    for shop_id, summary_date in pending:
+        by_date.setdefault(summary_date, set()).add(shop_id)
+
+    try:
+        async with async_session() as session:
+            for summary_date, shop_ids in by_date.items():
+                await refresh_daily_summary(session, summary_date, shop_ids)
+            await session.commit()
+    except Exception:
+        # Keep the days dirty so the next flush retries them
+        _dirty.update(pending)
+        raise
+
+
+async def refresh_recent_summaries():
+    # Picks up writes that bypass the API (expenses, cashbox) and late offline syncs
+    async with async_session() as session:
+        locked = await session.scalar(select(func.pg_try_advisory_xact_lock(SUMMARY_LOCK_ID)))
+        if not locked:
+            return
+        today = date.today()
+        await refresh_daily_summary(session, today - timedelta(days=1))
+        await refresh_daily_summary(session, today)
+        await session.commit()
@@ -0,0 +1,76 @@
+import os
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import false
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel, select
+
+from utils.database import get_session
+from utils.helper_auth import get_current_user
+from utils.helper_cache import TieredCache
+from utils.models import Companies, Shops, Users
+
+# Shop -> company -> license resolution keyed by shop id, shared by every user of the shop
+TENANT_CACHE_TTL = int(os.getenv("TENANT_CACHE_TTL", "300"))
+# Invalidation only reaches Redis and the worker that made the change; every other worker
+# may authorize against a moved shop or a changed license for up to this long
+TENANT_LOCAL_TTL = int(os.getenv("TENANT_LOCAL_TTL", "5"))
+tenant_cache = TieredCache("tenant", maxsize=10000, ttl=TENANT_CACHE_TTL, local_ttl=TENANT_LOCAL_TTL)
+
+
+class TenantScope(SQLModel):
+    user_id: int
+    user_level_id: int
+    shop_id: int
+    company_id: Optional[int] = None
+    license_id: Optional[int] = None
+
+
+async def get_tenant_scope(
+    current_user: Users = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+) -> TenantScope:
+    tenant = await tenant_cache.get(current_user.shop_id)
+    if tenant is None:
+        # Join: Shop → Company → License in a single round trip
+        statement = (
+            select(Shops.company_id, Companies.license_id)
+            .outerjoin(Companies, Companies.id == Shops.company_id)
+            .where(Shops.id == current_user.shop_id)
+        )
+        result = await session.execute(statement)
+        row = result.one_or_none()
+        tenant = {
+            "company_id": row.company_id if row else None,
+            "license_id": row.license_id if row else None
+        }
+        await tenant_cache.set(current_user.shop_id, tenant)
+
+    return TenantScope(
+        user_id=current_user.id,
+        user_level_id=current_user.user_level_id,
+        shop_id=current_user.shop_id,
+        **tenant
+    )
+
+def in_company(column, scope: TenantScope):
+    # Shops without a company belong to nobody's company; `column == None` would match all of them
+    if scope.company_id is None:
+        return false()
+    return column == scope.company_id
+
+def require_company(scope: TenantScope):
+    # Admins act on their company's records; one whose shop has no company has none to act on
+    if scope.company_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Your shop does not belong to a company"
+        )
+
+async def invalidate_tenant_scope(shop_id: int):
+    await tenant_cache.delete(shop_id)
+
+async def invalidate_all_tenant_scopes():
+    # Company changes (e.g. a new license) affect every shop of the company
+    await tenant_cache.clear()
@@ -0,0 +1,156 @@
+from datetime import date, datetime
+from typing import Dict, List
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from utils.helper_ledger import Movement, lock_shop_stock, record_movements
+from utils.models import Products, Stock, Stock_Balances, Stock_Transfers
+from utils.schemas import StockTransferItem, StockTransferLine, StockTransferResult
+
+# Items per transfer; both sides' stock rows then fit one upsert statement
+MAX_TRANSFER_ITEMS = 500
+
+
+async def load_transfer_products(session: AsyncSession, shop_id: int, where) -> List[tuple]:
+    # Products with their prices and the quantity on hand before the transfer
+    statement = (
+        select(
+            Products.id,
+            Products.name,
+            Products.purchase_price,
+            Products.selling_price,
+            func.coalesce(Stock_Balances.on_hand, 0).label("on_hand")
+        )
+        .outerjoin(Stock_Balances, (Stock_Balances.product_id == Products.id) & (Stock_Balances.shop_id == shop_id))
+        .where(Products.shop_id == shop_id)
+        .where(where)
+    )
+    result = await session.execute(statement)
+    return result.all()
+
+
+async def transfer_stock(
+    session: AsyncSession,
+    from_shop_id: int,
+    to_shop_id: int,
+    stock_date: date,
+    items: List[StockTransferItem],
+    user_id: int
+) -> StockTransferResult:
+    """Move `items` out of one shop and into another, in the caller's transaction.
+
+    Products are matched across shops by name. Each side gets one "transfer" movement
+    per product, and the quantity is taken off the sending shop's additions for the day
+    and added to the receiving shop's. Nothing is written unless every item can move.
+    """
+    # Later days' rows already opened from this day's close; moving a past or future day would leave them wrong
+    if stock_date != date.today():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Stock can only be transferred on today's date")
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Transfer has no items")
+    if len(items) > MAX_TRANSFER_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_TRANSFER_ITEMS} products can be transferred at once"
+        )
+    if any(item.quantity <= 0 for item in items):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantities must be greater than zero")
+
+    # A product sent twice moves once, with the quantities added up
+    quantities: Dict[int, float] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    # Both shops' balances are read and then moved; no other stock writer may touch either meanwhile
+    await lock_shop_stock(session, from_shop_id, to_shop_id)
+
+    sources = {row.id: row for row in await load_transfer_products(session, from_shop_id, Products.id.in_(quantities.keys()))}
+    missing = [product_id for product_id in quantities if product_id not in sources]
+    if missing:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Products not found: {missing}")
+
+    short = [sources[product_id].name for product_id, quantity in quantities.items() if sources[product_id].on_hand < quantity]
+    if short:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock of: {', '.join(short)}")
+
+    # The receiving shop's product of each name; the oldest one when a name is repeated
+    names = {source.name for source in sources.values()}
+    rows = await load_transfer_products(session, to_shop_id, Products.name.in_(names))
+    targets = {}
+    for row in sorted(rows, key=lambda row: row.id):
+        targets.setdefault(row.name, row)
+    unmatched = sorted(names - targets.keys())
+    if unmatched:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Products missing in the receiving shop: {', '.join(unmatched)}"
+        )
+
+    now = datetime.now()
+    result = await session.execute(
+        insert(Stock_Transfers)
+        .values(from_shop_id=from_shop_id, to_shop_id=to_shop_id, stock_date=stock_date, created_at=now, created_by=user_id)
+        .returning(Stock_Transfers.id)
+    )
+    transfer_id = result.scalar_one()
+
+    received: Dict[int, float] = {}
+    for product_id, quantity in quantities.items():
+        target = targets[sources[product_id].name]
+        received[target.id] = received.get(target.id, 0) + quantity
+
+    # A day's row created here opens at the balance before the transfer, as the rollover would
+    # have carried it over; an existing row only has its additions moved
+    def stock_row(shop_id: int, product, additions: float) -> dict:
+        return {
+            "stock_date": stock_date,
+            "product_id": product.id,
+            "shop_id": shop_id,
+            "opening": product.on_hand,
+            "additions": additions,
+            "purchase_price": product.purchase_price,
+            "selling_price": product.selling_price,
+            "created_at": now,
+            "created_by": user_id,
+            "updated_at": now,
+            "updated_by": user_id
+        }
+
+    stock_rows = [stock_row(from_shop_id, sources[product_id], -quantity) for product_id, quantity in quantities.items()]
+    targets_by_id = {target.id: target for target in targets.values()}
+    stock_rows += [stock_row(to_shop_id, targets_by_id[product_id], quantity) for product_id, quantity in received.items()]
+    # Both sides in one statement, in (shop, product) order like every other stock upsert
+    stock_rows.sort(key=lambda row: (row["shop_id"], row["product_id"]))
+    statement = pg_insert(Stock).values(stock_rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Stock.stock_date, Stock.product_id, Stock.shop_id],
+        set_={
+            "additions": func.coalesce(Stock.additions, 0) + statement.excluded.additions,
+            "updated_at": statement.excluded.updated_at,
+            "updated_by": statement.excluded.updated_by,
+            "version": Stock.version + 1
+        }
+    )
+    await session.execute(statement)
+
+    from_balances = await record_movements(session, from_shop_id, [
+        Movement(product_id, -quantity, "transfer", stock_date, transfer_id) for product_id, quantity in quantities.items()
+    ], user_id)
+    to_balances = await record_movements(session, to_shop_id, [
+        Movement(product_id, quantity, "transfer", stock_date, transfer_id) for product_id, quantity in received.items()
+    ], user_id)
+
+    lines = []
+    for product_id, quantity in quantities.items():
+        to_product_id = targets[sources[product_id].name].id
+        lines.append(StockTransferLine(
+            product_id=product_id, to_product_id=to_product_id, quantity=quantity,
+            from_on_hand=from_balances[product_id], to_on_hand=to_balances[to_product_id]
+        ))
+    return StockTransferResult(
+        id=transfer_id, from_shop_id=from_shop_id, to_shop_id=to_shop_id, stock_date=stock_date, items=lines
+    )
\ No newline at end of file
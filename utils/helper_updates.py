@@ -0,0 +1,83 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional, Sequence, Set
+
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel, select
+
+from utils.helper_versioning import check_version
+
+# Set by the server on every write; a client sending them in an update body is ignored
+PROTECTED_FIELDS = {"id", "created_at", "created_by", "updated_at", "updated_by", "version"}
+
+
+@lru_cache(maxsize=None)
+def field_adapter(model, field: str) -> TypeAdapter:
+    return TypeAdapter(model.model_fields[field].annotation)
+
+
+def update_values(changes: SQLModel) -> dict:
+    """The fields that were sent, minus the protected ones, as the column types expect them.
+
+    Table models are not validated when FastAPI builds them from a body, so e.g. a date
+    still arrives as a string; each field is validated against its annotation here.
+    """
+    values = {}
+    for key in changes.model_fields_set - PROTECTED_FIELDS:
+        try:
+            values[key] = field_adapter(type(changes), key).validate_python(getattr(changes, key))
+        except ValidationError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Invalid {key}") from e
+    return values
+
+
+async def partial_update(
+    session: AsyncSession,
+    model,
+    changes: SQLModel,
+    criteria: List,
+    user_id: int,
+    name: str,
+    expected_versions: Optional[Set[int]] = None,
+    previous: Sequence = ()
+) -> dict:
+    """Apply the fields set on `changes` to the one row matching `criteria`, in a single UPDATE ... RETURNING.
+
+    `criteria` carries the tenant scope, so a row the caller may not edit is not found.
+    The audit fields and the version are set here, never from the body. With
+    `expected_versions` the row must still be at one of them. Columns in `previous` are
+    returned as `previous_<name>` with their values from before the update. A missing row
+    raises 404 and one at another version 412; telling them apart costs a query only
+    when nothing matched.
+    """
+    statement = (
+        update(model)
+        .where(*criteria)
+        .values(**update_values(changes), updated_at=datetime.now(), updated_by=user_id, version=model.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if expected_versions is not None:
+        statement = statement.where(model.version.in_(expected_versions))
+
+    returning = list(model.__table__.columns)
+    if previous:
+        # UPDATE ... FROM (SELECT ...): the subquery reads the row as it was before this statement
+        before = select(model.id, *previous).where(*criteria).subquery("previous")
+        statement = statement.where(model.id == before.c.id)
+        returning += [before.c[column.key].label(f"previous_{column.key}") for column in previous]
+
+    result = await session.execute(statement.returning(*returning))
+    row = result.mappings().one_or_none()
+    if row is not None:
+        return dict(row)
+
+    result = await session.execute(select(model.version).where(*criteria))
+    version = result.scalar_one_or_none()
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{name} not found")
+    check_version(version, expected_versions, name)
+    # Only reached when the row changed between the two statements; the client retries either way
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=f"{name} has changed since it was read")
\ No newline at end of file
@@ -0,0 +1,29 @@
+from typing import Optional, Set
+
+from fastapi import Header, HTTPException, status
+
+
+def version_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+async def get_if_match(if_match: Optional[str] = Header(None)) -> Optional[Set[int]]:
+    """Row versions an update may apply to, from If-Match; None when any version will do."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = set()
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        # Strong comparison (RFC 9110): a weak tag never matches, and neither does a malformed one
+        if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+            versions.add(int(tag[1:-1]))
+    return versions
+
+
+def check_version(version: int, expected: Optional[Set[int]], name: str):
+    if expected is not None and version not in expected:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"{name} has changed since it was read",
+            headers={"ETag": version_etag(version)}
+        )
@@ -1,5 +1,6 @@
 from typing import Optional
 from datetime import date, datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 class User_Levels(SQLModel, table=True):
@@ -13,6 +14,12 @@ class User_Levels(SQLModel, table=True):
     updated_by: Optional[int] = None
 
 class Users(SQLModel, table=True):
+    __table_args__ = (
+        # Login looks users up by phone, so it has to identify exactly one
+        Index("ux_users_phone", "phone", unique=True),
+        Index("ix_users_shop_id", "shop_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     phone: str
@@ -23,6 +30,7 @@ class Users(SQLModel, table=True):
     created_by: int = 0
     updated_at: Optional[datetime] = Field()
     updated_by: Optional[int] = None
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
         
 class Packages(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -48,6 +56,7 @@ class Licenses(SQLModel, table=True):
     created_by: int = 0
     updated_at: datetime = Field(nullable=False)
     updated_by: Optional[int] = None 
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
                 
 class Companies(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -57,6 +66,7 @@ class Companies(SQLModel, table=True):
     created_by: int = 0
     updated_at: datetime = Field(nullable=False)
     updated_by: Optional[int] = None    
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
         
 class Shop_Types(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -68,11 +78,15 @@ class Shop_Types(SQLModel, table=True):
     updated_by: Optional[int] = None 
 
 class Shops(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_shops_company_id", "company_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     location: str
-    company_id: int
-    shop_type_id: int
+    company_id: int = Field(foreign_key="companies.id")
+    shop_type_id: int = Field(foreign_key="shop_types.id")
     created_at: datetime = Field(nullable=False)
     created_by: int = 0
     updated_at: Optional[datetime] = Field()
@@ -82,33 +96,51 @@ class Shops(SQLModel, table=True):
     paybill: Optional[str] = None
     account_no: Optional[str] = None
     till_no: Optional[str] = None
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
 
 class Product_Categories(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_product_categories_shop_id", "shop_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
-    shop_id: int = None
+    shop_id: int = Field(default=None, foreign_key="shops.id")
     created_at: datetime = Field(nullable=False)
     created_by: int = 0
     updated_at: datetime = Field(nullable=False)
     updated_by: Optional[int] = None    
 
 class Products(SQLModel, table=True):
+    __table_args__ = (
+        # Product listings of a shop, optionally narrowed to a category
+        Index("ix_products_shop_category", "shop_id", "category_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     purchase_price: float = None
     selling_price: float = None
-    category_id: int = None
-    shop_id: int = None
+    category_id: int = Field(default=None, foreign_key="product_categories.id")
+    shop_id: int = Field(default=None, foreign_key="shops.id")
     created_at: datetime = Field(nullable=False)
     created_by: int = 0
     updated_at: Optional[datetime] = Field()
     updated_by: Optional[int] = None
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
     
 class Stock(SQLModel, table=True):
+    __table_args__ = (
+        # One row per product per shop per day; also the conflict target of bulk stock-takes
+        Index("ux_stock_date_product_shop", "stock_date", "product_id", "shop_id", unique=True),
+        # A shop's stock over a date range, in the (stock_date, id) keyset order of the listing
+        Index("ix_stock_shop_date", "shop_id", "stock_date", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     stock_date: date
-    product_id: int
-    shop_id: int
+    product_id: int = Field(foreign_key="products.id")
+    shop_id: int = Field(foreign_key="shops.id")
     purchase_price: float = None
     selling_price: float = None
     opening: float = None
@@ -117,6 +149,54 @@ class Stock(SQLModel, table=True):
     created_by: int = 0
     updated_at: Optional[datetime] = Field()
     updated_by: Optional[int] = None
+    # Bumped by every write; PATCH handlers take it in If-Match so an edit cannot silently overwrite a newer one
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+
+class Stock_Movements(SQLModel, table=True):
+    __table_args__ = (
+        # A shop's ledger, and a product's history in it, in the order it happened
+        Index("ix_stock_movements_shop_id", "shop_id", "id"),
+        Index("ix_stock_movements_shop_product_id", "shop_id", "product_id", "id"),
+    )
+
+    # Append-only: corrections are new movements, never edits
+    id: Optional[int] = Field(default=None, primary_key=True)
+    shop_id: int = Field(foreign_key="shops.id")
+    product_id: int = Field(foreign_key="products.id")
+    # purchase, sale, adjustment or transfer
+    movement_type: str
+    # Signed change to the quantity on hand
+    quantity: float
+    balance_after: float
+    # The stock day it belongs to
+    stock_date: date
+    # Bill of a sale, stock row of a purchase or adjustment, transfer of a transfer
+    reference_id: Optional[int] = None
+    created_at: datetime = Field(nullable=False)
+    created_by: int = 0
+
+class Stock_Transfers(SQLModel, table=True):
+    # Goods moved between two shops of a company; its stock_movements carry its id
+    id: Optional[int] = Field(default=None, primary_key=True)
+    from_shop_id: int = Field(foreign_key="shops.id")
+    to_shop_id: int = Field(foreign_key="shops.id")
+    stock_date: date
+    created_at: datetime = Field(nullable=False)
+    created_by: int = 0
+
+class Stock_Balances(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_stock_balances_shop_product", "shop_id", "product_id", unique=True),
+    )
+
+    # Running total of stock_movements per shop and product, kept up to date as they are recorded
+    id: Optional[int] = Field(default=None, primary_key=True)
+    shop_id: int = Field(foreign_key="shops.id")
+    product_id: int = Field(foreign_key="products.id")
+    on_hand: float = 0
+    # When on_hand last dropped to zero or below; None while in stock
+    out_of_stock_since: Optional[datetime] = None
+    updated_at: datetime = Field(nullable=False)
 
 class Customers(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -129,6 +209,11 @@ class Customers(SQLModel, table=True):
     updated_by: Optional[int] = None
 
 class Bills(SQLModel, table=True):
+    __table_args__ = (
+        # A shop's bills of a day, read by the daily summary
+        Index("ix_bills_shop_created_at", "shop_id", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     customer_id: int = None
     total: float = None
@@ -139,6 +224,36 @@ class Bills(SQLModel, table=True):
     updated_at: Optional[datetime] = Field()
     updated_by: Optional[int] = None
 
+class Bill_Items(SQLModel, table=True):
+    __table_args__ = (
+        # Daily sales per product, read by the stock rollover
+        Index("ix_bill_items_shop_date_product", "shop_id", "stock_date", "product_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    bill_id: int = Field(foreign_key="bills.id")
+    product_id: int = Field(foreign_key="products.id")
+    quantity: float
+    price: float
+    total: float
+    stock_date: date
+    shop_id: int
+    created_at: datetime = Field(nullable=False)
+    created_by: int = 0
+    updated_at: Optional[datetime] = Field()
+    updated_by: Optional[int] = None
+
+class Idempotency_Keys(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_idempotency_keys_shop_key", "shop_id", "key", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str
+    shop_id: int
+    bill_id: Optional[int] = None
+    created_at: datetime = Field(nullable=False)
+
 class Expenses(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     date: Optional[str] = None
@@ -160,7 +275,7 @@ class Payment_Modes(SQLModel, table=True):
     
 class Payments(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    bill_id: int = None
+    bill_id: int = Field(default=None, foreign_key="bills.id")
     amount: float = None
     payment_mode_id: int = None
     shop_id: int = None
@@ -180,3 +295,26 @@ class Cashbox(SQLModel, table=True):
     updated_at: Optional[datetime] = Field()
     updated_by: Optional[int] = None
 
+
+
+class Shop_Daily_Summary(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_shop_daily_summary_shop_date", "shop_id", "summary_date", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    shop_id: int
+    summary_date: date
+    stock_value_cost: float = 0
+    stock_value_retail: float = 0
+    sales: float = 0
+    expenses: float = 0
+    cash: float = 0
+    mpesa: float = 0
+    updated_at: datetime = Field(nullable=False)
+
+class Schema_Migrations(SQLModel, table=True):
+    # One row per migration in utils/helper_migrations.py that has been applied
+    version: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    name: str
+    applied_at: datetime = Field(nullable=False)
\ No newline at end of file
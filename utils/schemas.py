@@ -0,0 +1,161 @@
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlmodel import SQLModel
+
+
+# Lean listing rows: the columns the list screens show, selected as plain rows rather than entities
+
+class StockRow(SQLModel):
+    id: int
+    stock_date: date
+    product_id: int
+    product_name: str
+    category_id: Optional[int] = None
+    purchase_price: Optional[float] = None
+    selling_price: Optional[float] = None
+    opening: Optional[float] = None
+    additions: Optional[float] = None
+    updated_at: Optional[datetime] = None
+
+class ProductRow(SQLModel):
+    id: int
+    name: str
+    category_id: Optional[int] = None
+    purchase_price: Optional[float] = None
+    selling_price: Optional[float] = None
+    updated_at: Optional[datetime] = None
+
+class ShopRow(SQLModel):
+    id: int
+    name: str
+    location: str
+    company_id: int
+    shop_type_id: int
+    phone_1: Optional[str] = None
+    phone_2: Optional[str] = None
+    paybill: Optional[str] = None
+    account_no: Optional[str] = None
+    till_no: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+class StockBalanceRow(SQLModel):
+    product_id: int
+    product_name: str
+    category_id: Optional[int] = None
+    on_hand: float
+    out_of_stock_since: Optional[datetime] = None
+    updated_at: datetime
+
+class StockMovementRow(SQLModel):
+    id: int
+    product_id: int
+    movement_type: str
+    quantity: float
+    balance_after: float
+    stock_date: date
+    reference_id: Optional[int] = None
+    created_at: datetime
+    created_by: int
+
+# Everything about a user except the password hash
+class UserRow(SQLModel):
+    id: int
+    name: str
+    phone: str
+    shop_id: int
+    user_level_id: int
+    updated_at: Optional[datetime] = None
+    version: int
+
+class StockSheetRow(SQLModel):
+    id: int
+    product_id: int
+    product_name: str
+    category_id: Optional[int] = None
+    category_name: str
+    opening: Optional[float] = None
+    additions: Optional[float] = None
+
+# A day's stock sheet as parallel columns; categories names are keyed by category_id
+class StockSheet(SQLModel):
+    stock_date: date
+    count: int
+    id: List[int]
+    product_id: List[int]
+    product_name: List[str]
+    category_id: List[Optional[int]]
+    opening: List[Optional[float]]
+    additions: List[Optional[float]]
+    categories: Dict[int, str]
+
+class StockTakeItem(SQLModel):
+    product_id: int
+    opening: Optional[float] = None
+    additions: Optional[float] = None
+    purchase_price: Optional[float] = None
+    selling_price: Optional[float] = None
+
+class StockTake(SQLModel):
+    stock_date: date
+    items: List[StockTakeItem]
+
+class StockTakeResult(SQLModel):
+    product_id: int
+    id: Optional[int] = None
+    status: str
+    detail: Optional[str] = None
+
+class StockTransferItem(SQLModel):
+    # A product of the sending shop; it arrives as the receiving shop's product of the same name
+    product_id: int
+    quantity: float
+
+class StockTransfer(SQLModel):
+    to_shop_id: int
+    # Defaults to the caller's shop
+    from_shop_id: Optional[int] = None
+    # Defaults to today, the only day stock can be transferred on
+    stock_date: Optional[date] = None
+    items: List[StockTransferItem]
+
+class StockTransferLine(SQLModel):
+    product_id: int
+    to_product_id: int
+    quantity: float
+    # On hand in each shop after the transfer
+    from_on_hand: float
+    to_on_hand: float
+
+class StockTransferResult(SQLModel):
+    id: int
+    from_shop_id: int
+    to_shop_id: int
+    stock_date: date
+    items: List[StockTransferLine]
+
+class SaleItem(SQLModel):
+    product_id: int
+    quantity: float
+    # Defaults to the product's selling price
+    price: Optional[float] = None
+
+class SalePayment(SQLModel):
+    payment_mode_id: int
+    amount: float
+
+class Sale(SQLModel):
+    idempotency_key: Optional[str] = None
+    customer_id: Optional[int] = None
+    # When the sale happened; offline sales are synced later
+    sold_at: Optional[datetime] = None
+    items: List[SaleItem]
+    payments: List[SalePayment] = []
+
+class SaleResult(SQLModel):
+    idempotency_key: Optional[str] = None
+    bill_id: Optional[int] = None
+    total: Optional[float] = None
+    paid: Optional[float] = None
+    status: str
+    detail: Optional[str] = None